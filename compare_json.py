@@ -5,28 +5,32 @@ compare_two_jsons_hardcoded.py
 - Compares dicts/lists/strings/integers (also handles bool/null gracefully)
 - Prints human-readable differences with JSONPath-like locations
 
-Edit LEFT_FILE and RIGHT_FILE to point at your files.
+Edit LEFT_FILE and RIGHT_FILE to point at your files (.jsonl files are
+compared as a list of their records).
 Exit code: 0 if equal, 1 otherwise.
 """
 from __future__ import annotations
 import json
 import sys
+from collections import deque
+from operator import itemgetter
 from pathlib import Path
 from typing import Any, List, Tuple
-import re
+
+import orjson
 
 # ─── Hard-coded file paths ────────────────────────────────────────────────────
-LEFT_FILE  = Path("files/delivery/batch_5/batch_5-patched.json")
+LEFT_FILE  = Path("files/delivery/batch_5/batch_5-final.jsonl")
 RIGHT_FILE = Path("files/delivery/batch_5/batch_5-patched-old.json")
 
 Diff = Tuple[str, str, Any, Any]  # (KIND, path, left_value, right_value)
-_ident_re = re.compile(r"^[A-Za-z_]\w*$")
 
 
 def load_json(p: Path) -> Any:
     try:
-        with p.open("r", encoding="utf-8") as f:
-            return json.load(f)
+        if p.suffix == ".jsonl":
+            return [orjson.loads(line) for line in p.read_bytes().splitlines() if line.strip()]
+        return orjson.loads(p.read_bytes())
     except FileNotFoundError:
         print(f"[ERROR] File not found: {p}", file=sys.stderr)
         sys.exit(1)
@@ -35,54 +39,81 @@ def load_json(p: Path) -> Any:
         sys.exit(1)
 
 
-def join_path(base: str, key: Any) -> str:
+def path_segment(key: Any) -> str:
     if isinstance(key, int):
-        return f"{base}[{key}]"
+        return f"[{key}]"
     s = str(key)
-    if _ident_re.match(s):
-        return f"{base}.{s}"
+    if s.isascii() and s.isidentifier():  # ASCII [A-Za-z_]\w*, checked in C without a regex
+        return f".{s}"
     s = s.replace("\\", "\\\\").replace('"', r'\"')
-    return f'{base}["{s}"]'
-
+    return f'["{s}"]'
 
-def short(value: Any, width: int = 120) -> str:
-    s = json.dumps(value, ensure_ascii=False)
-    return s if len(s) <= width else s[: width - 1] + "…"
 
+def format_path(root: str, keys: Tuple[Any, ...]) -> str:
+    return "".join([root, *map(path_segment, keys)])
 
-def diff_values(left: Any, right: Any, path: str, diffs: List[Diff]) -> None:
-    # Strict type check (e.g., int vs str is a mismatch)
-    if type(left) is not type(right):
-        diffs.append(("TYPE_MISMATCH", path, type(left).__name__, type(right).__name__))
-        return
 
-    # Dicts
-    if isinstance(left, dict):
-        lk, rk = set(left.keys()), set(right.keys())
+_preview_encoder = json.JSONEncoder(ensure_ascii=False)
 
-        for k in sorted(lk - rk):
-            diffs.append(("MISSING_IN_RIGHT", join_path(path, k), left[k], None))
-        for k in sorted(rk - lk):
-            diffs.append(("MISSING_IN_LEFT", join_path(path, k), None, right[k]))
 
-        for k in sorted(lk & rk):
-            diff_values(left[k], right[k], join_path(path, k), diffs)
-        return
+def short(value: Any, width: int = 120) -> str:
+    if isinstance(value, (dict, list)):
+        # Stop encoding once the preview is full: O(width) work, not O(size of value)
+        parts, size = [], 0
+        for chunk in _preview_encoder.iterencode(value):
+            parts.append(chunk)
+            size += len(chunk)
+            if size > width:
+                break
+        s = "".join(parts)
+    else:
+        s = json.dumps(value, ensure_ascii=False)
+    return s if len(s) <= width else s[: width - 1] + "…"
 
-    # Lists (order-sensitive, compare by index)
-    if isinstance(left, list):
-        min_len = min(len(left), len(right))
-        for i in range(min_len):
-            diff_values(left[i], right[i], join_path(path, i), diffs)
-        for i in range(min_len, len(left)):
-            diffs.append(("MISSING_IN_RIGHT", join_path(path, i), left[i], None))
-        for i in range(min_len, len(right)):
-            diffs.append(("MISSING_IN_LEFT", join_path(path, i), None, right[i]))
-        return
 
-    # Primitives (str, int, bool, None)
-    if left != right:
-        diffs.append(("VALUE_DIFF", path, left, right))
+def diff_values(left: Any, right: Any, path: str, diffs: List[Diff]) -> None:
+    # Explicit work-stack instead of recursion: no frame per node, no depth limit.
+    # Locations travel as key tuples and are only formatted when a diff is reported.
+    stack = deque([(left, right, ())])
+    while stack:
+        left, right, keys = stack.pop()
+        if left is right:
+            continue
+
+        # Strict type check (e.g., int vs str is a mismatch)
+        if type(left) is not type(right):
+            diffs.append(("TYPE_MISMATCH", format_path(path, keys), type(left).__name__, type(right).__name__))
+            continue
+
+        # Dicts
+        if isinstance(left, dict):
+            # Dict order is stable; the final sort in main() fixes the global order
+            children = []
+            for k, lv in left.items():
+                if k in right:
+                    children.append((lv, right[k], keys + (k,)))
+                else:
+                    diffs.append(("MISSING_IN_RIGHT", format_path(path, keys + (k,)), lv, None))
+            for k, rv in right.items():
+                if k not in left:
+                    diffs.append(("MISSING_IN_LEFT", format_path(path, keys + (k,)), None, rv))
+
+            stack.extend(reversed(children))
+            continue
+
+        # Lists (order-sensitive, compare by index)
+        if isinstance(left, list):
+            min_len = min(len(left), len(right))
+            for i in range(min_len, len(left)):
+                diffs.append(("MISSING_IN_RIGHT", format_path(path, keys + (i,)), left[i], None))
+            for i in range(min_len, len(right)):
+                diffs.append(("MISSING_IN_LEFT", format_path(path, keys + (i,)), None, right[i]))
+            stack.extend(reversed([(left[i], right[i], keys + (i,)) for i in range(min_len)]))
+            continue
+
+        # Primitives (str, int, bool, None)
+        if left != right:
+            diffs.append(("VALUE_DIFF", format_path(path, keys), left, right))
 
 
 def print_diffs(diffs: List[Diff], left_name: str, right_name: str) -> None:
@@ -112,7 +143,7 @@ def main() -> int:
     right = load_json(RIGHT_FILE)
     diffs: List[Diff] = []
     diff_values(left, right, "$", diffs)
-    diffs.sort(key=lambda d: (d[1], d[0]))  # stable, readable order
+    diffs.sort(key=itemgetter(1, 0))  # stable, readable order (path, kind)
     print_diffs(diffs, LEFT_FILE.name, RIGHT_FILE.name)
     return 0 if not diffs else 1
 
@@ -19,22 +19,28 @@ For every PR we store:
 Requirements
 ------------
 Python ≥ 3.8
-pip install requests tqdm python-dateutil dotenv
+pip install requests tqdm dotenv orjson
 export GITHUB_TOKEN=<PAT with repo-read scope>
+export PR_FILES_CACHE=1   # optional: reuse PR file lists from files/cache/pr_files
 """
 from __future__ import annotations
-import json
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List
-from dateutil.parser import isoparse
 import dotenv
 
+from utils import is_test
+
 dotenv.load_dotenv()
 
 # --------------------------------------------------------------------------- #
@@ -50,12 +56,36 @@ HEADERS = {
 }
 GRAPHQL_URL = "https://api.github.com/graphql"
 
+# One keep-alive session for every call (no TLS handshake per request); the
+# adapter retries transient 5xx itself. GraphQL POSTs are read-only, so they
+# may be retried too. The pool is sized above MAX_WORKERS.
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[502, 503, 504],
+                      allowed_methods=None, raise_on_status=False),
+))
+
 REPOS_FILE = Path("files/final_repos.txt")
 OUTPUT_DIR = Path("files/prs")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Opt-in on-disk cache of REST file lists, so reruns don't re-fetch every PR
+PR_FILES_CACHE     = os.getenv("PR_FILES_CACHE") == "1"
+PR_FILES_CACHE_DIR = Path("files/cache/pr_files")
+
+# Repos are fetched concurrently; GitHub tolerates ~10 in-flight requests per token
+MAX_WORKERS = 8
+# Pause all workers until the window resets once fewer requests than this remain
+RATE_LIMIT_FLOOR = 50
+
 # YEAR_AGO = datetime.now(timezone.utc) - timedelta(days=566)
 CUTOFF_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+# GitHub returns createdAt as canonical UTC "YYYY-MM-DDTHH:MM:SSZ", which sorts
+# lexicographically, so PRs are compared as strings instead of parsed per PR.
+CUTOFF_ISO = CUTOFF_DATE.strftime("%Y-%m-%dT%H:%M:%SZ")
 
 # --------------------------------------------------------------------------- #
 # GraphQL helpers
@@ -65,19 +95,45 @@ from tqdm import tqdm
 repo_bar = tqdm(desc="Repositories", unit="repo")
 api_bar  = tqdm(desc="HTTP requests", unit="req", position=1, leave=False)
 
+# ─── shared rate-limit backoff ────────────────────────────────────────────────
+_rate_lock = threading.Lock()
+_rate_resume_at = 0.0   # epoch seconds; workers hold off until then
+
+
+def wait_for_rate_limit() -> None:
+    """Block the calling worker while a rate-limit pause is in effect."""
+    with _rate_lock:
+        delay = _rate_resume_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def note_rate_limit(r: requests.Response) -> None:
+    """Schedule a pause for every worker when the remaining quota runs low."""
+    global _rate_resume_at
+    remaining = r.headers.get("X-RateLimit-Remaining")
+    reset     = r.headers.get("X-RateLimit-Reset")
+    if remaining is None or reset is None or int(remaining) >= RATE_LIMIT_FLOOR:
+        return
+    with _rate_lock:
+        if int(reset) > _rate_resume_at:
+            _rate_resume_at = float(reset)
+            tqdm.write(f"⏳  {remaining} requests left; pausing until {datetime.fromtimestamp(int(reset))}")
+
 # ─── GraphQL helper ───────────────────────────────────────────────────────────
 def gql(query: str, variables: Dict[str, Any], *, max_attempts: int = 3) -> Dict[str, Any]:
     """POST a GraphQL query with up to `max_attempts` attempts total."""
     last_err = None
     for attempt in range(1, max_attempts + 1):
         try:
+            wait_for_rate_limit()
             api_bar.update(1)  # ← tick before each POST/attempt
-            r = requests.post(
+            r = SESSION.post(
                 GRAPHQL_URL,
-                headers=HEADERS,
                 json={"query": query, "variables": variables},
                 timeout=30,  # good practice
             )
+            note_rate_limit(r)
             if r.status_code != 200:
                 raise RuntimeError(f"HTTP {r.status_code}: {r.text[:200]}…")
 
@@ -89,12 +145,14 @@ def gql(query: str, variables: Dict[str, Any], *, max_attempts: int = 3) -> Dict
             return body["data"]
 
         except Exception as exc:
-            print(f"⚠️  Error in attempt {attempt} for {variables['owner']}/{variables['name']}: {exc}")
+            tqdm.write(f"⚠️  Error in attempt {attempt} for {variables['owner']}/{variables['name']}: {exc}")
             if attempt == max_attempts:
                 raise exc # out of attempts; bubble up the last error
 
             time.sleep(1)
 
+GQL_FILES_PAGE = 50   # must match files(first:…) in PRS_QUERY
+
 PRS_QUERY = """
 query ($owner:String!,$name:String!,$cursor:String) {
   repository(owner:$owner, name:$name) {
@@ -109,8 +167,9 @@ query ($owner:String!,$name:String!,$cursor:String) {
         baseRefOid
         headRefOid
         mergeCommit { oid }
-        files(first:1) {                       # only need the count here
+        files(first:50) {                      # paths inline; REST only as fallback
           totalCount
+          nodes { path changeType }
         }
       }
     }
@@ -124,48 +183,62 @@ query ($owner:String!,$name:String!,$cursor:String) {
 REST_API = "https://api.github.com"
 
 def rest_pull_files(owner: str, repo: str, pr_number: int):
+    cache_file = PR_FILES_CACHE_DIR / f"{owner}__{repo}__{pr_number}.json"
+    if PR_FILES_CACHE and cache_file.exists():
+        return orjson.loads(cache_file.read_bytes())
+
+    wait_for_rate_limit()
     api_bar.update(1)                     # ← tick for each GET
     url = f"{REST_API}/repos/{owner}/{repo}/pulls/{pr_number}/files?per_page=100"
-    r = requests.get(url, headers=HEADERS, timeout=30)
+    r = SESSION.get(url, timeout=30)
+    note_rate_limit(r)
     if r.headers.get("X-RateLimit-Remaining") == "0":
         raise RuntimeError(f"Request rate limit exceeded")
 
     if r.status_code != 200:
-        print("⚠️  Error fetching files for PR", pr_number, "in", f"{owner}/{repo}")
+        tqdm.write(f"⚠️  Error fetching files for PR {pr_number} in {owner}/{repo}")
         return None
-    return r.json()         # each element has filename, patch, etc.
+
+    files = r.json()        # each element has filename, patch, etc.
+    if PR_FILES_CACHE:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_bytes(orjson.dumps(files))
+    return files
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 3. Filtering + data collection
 # ─────────────────────────────────────────────────────────────────────────────
 
-def is_test(path: str) -> bool:
-    p = path.lower()
-    return "test/" in p or "tests/" in p or p.endswith("test.java") or p.endswith("it.java")
-
 def pr_matches_and_collect(owner: str, repo: str, pr: dict) -> dict | None:
     """
     Return a complete PR record (incl. per-file patch) OR None if it doesn’t
     satisfy the rules.
     """
-    if not pr["createdAt"] or isoparse(pr["createdAt"]) < CUTOFF_DATE:
+    if not pr["createdAt"] or pr["createdAt"] < CUTOFF_ISO:
         return None
     # if pr["files"]["totalCount"] > 5:
     #     return None
 
-    # one REST call because we may need the patches anyway
-    files = rest_pull_files(owner, repo, pr["number"])
-    if not files:
-        return None
-
-    paths = []
-    for f in files:
-        paths.append(f["filename"])
-        if f["status"] == "renamed" and "previous_filename" in f:
-            paths.append(f["previous_filename"])
-
-    modified_test = [p for p in paths if is_test(p)]
-    modified_source = [p for p in paths if not is_test(p)]
+    # Paths normally come with the GraphQL page. GraphQL doesn't expose a
+    # renamed file's old path, so renames and >50-file PRs still go to REST.
+    gql_files = pr["files"]
+    if gql_files["totalCount"] <= GQL_FILES_PAGE and \
+            not any(f["changeType"] == "RENAMED" for f in gql_files["nodes"]):
+        paths = [f["path"] for f in gql_files["nodes"]]
+    else:
+        files = rest_pull_files(owner, repo, pr["number"])
+        if not files:
+            return None
+
+        paths = []
+        for f in files:
+            paths.append(f["filename"])
+            if f["status"] == "renamed" and "previous_filename" in f:
+                paths.append(f["previous_filename"])
+
+    modified_test, modified_source = [], []
+    for p in paths:
+        (modified_test if is_test(p) else modified_source).append(p)
     modified_java = [p for p in modified_source if p.endswith(".java")]
 
 
@@ -214,14 +287,14 @@ def collect_prs(owner: str, name: str) -> list[dict]:
                 if rec:
                     prs.append(rec)
                 # early stop as soon as we fall out of the 1-year window
-                elif node["createdAt"] and isoparse(node["createdAt"]) < CUTOFF_DATE:
+                elif node["createdAt"] and node["createdAt"] < CUTOFF_ISO:
                     return prs
 
             if not page["pageInfo"]["hasNextPage"]:
                 return prs
             cursor = page["pageInfo"]["endCursor"]
         except Exception as e:
-            print(f"⚠️  Error processing {owner}/{name}: {e}")
+            tqdm.write(f"⚠️  Error processing {owner}/{name}: {e}")
             return prs
 
 
@@ -229,15 +302,18 @@ def collect_prs(owner: str, name: str) -> list[dict]:
 # Run
 # --------------------------------------------------------------------------- #
 repos = [l.strip() for l in REPOS_FILE.read_text().splitlines() if l.strip()]
-repo_bar = tqdm(repos, desc="Repositories", unit="repo")
-for repo in repo_bar:
-    owner, name = repo.split("/", 1)
-    pr_list = collect_prs(owner, name)
-
-    if pr_list and len(pr_list) > 0:
-        outfile = OUTPUT_DIR / f"{owner}_{name}.json"
-        with outfile.open("w", encoding="utf-8") as f:
-            json.dump(pr_list, f, indent=2)
-        tqdm.write(f"✅  {repo}: {len(pr_list)} PRs → {outfile}")
-    else:
-        tqdm.write(f"➖  {repo}: no qualifying PRs")
+repo_bar = tqdm(total=len(repos), desc="Repositories", unit="repo")
+with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+    futures = {ex.submit(collect_prs, *repo.split("/", 1)): repo for repo in repos}
+    for fut in as_completed(futures):
+        repo = futures[fut]
+        owner, name = repo.split("/", 1)
+        pr_list = fut.result()
+        repo_bar.update(1)
+
+        if pr_list and len(pr_list) > 0:
+            outfile = OUTPUT_DIR / f"{owner}_{name}.json"
+            outfile.write_bytes(orjson.dumps(pr_list, option=orjson.OPT_INDENT_2))
+            tqdm.write(f"✅  {repo}: {len(pr_list)} PRs → {outfile}")
+        else:
+            tqdm.write(f"➖  {repo}: no qualifying PRs")
@@ -1,8 +1,9 @@
 from pathlib import Path
-import json
 import csv
 import logging
 
+import ijson
+
 # --- Paths (hardcoded as requested) ---
 outfile = Path("files/rework/rework-description.csv")
 inFileFolder = Path("files/delivery")
@@ -27,35 +28,38 @@ for batch_dir in batch_dirs:
 
     for wrapped in wrapped_files:
         wrapped_count += 1
+        # Stream form[*] one record at a time; the rest of the file is never materialised
+        file_rows = []
+        seen_items = 0
         try:
-            with wrapped.open("r", encoding="utf-8") as fh:
-                data = json.load(fh)
-        except Exception as e:
+            with wrapped.open("rb") as fh:
+                for obj in ijson.items(fh, "form.item"):
+                    seen_items += 1
+                    if isinstance(obj, dict) and "taskId" in obj:
+                        metadata = obj["metadata"]["scope_requirements"]
+                        file_rows.append((
+                            obj["taskId"],
+                            f"https://labeling-z.turing.com/conversations/{obj["taskId"]}/view",
+                            metadata["Repository"],
+                            metadata["PR Link"],
+                        ))
+                    else:
+                        logging.warning(f"Item without 'id' in {wrapped}: {obj!r}")
+        except (OSError, ijson.JSONError) as e:
             logging.error(f"Failed to read {wrapped}: {e}")
             continue
 
-        form = data.get("form", [])
-        if not isinstance(form, list):
-            logging.warning(f"'sft' is missing or not a list in {wrapped}")
+        if not seen_items:
+            logging.warning(f"'form' is missing, empty or not a list in {wrapped}")
             continue
 
-        for obj in form:
-            if isinstance(obj, dict) and "taskId" in obj:
-                metadata = obj["metadata"]["scope_requirements"]
-                rows.append({
-                    "task_id": obj["taskId"],
-                    "task_link": f"https://labeling-z.turing.com/conversations/{obj["taskId"]}/view",
-                    "repo": metadata["Repository"],
-                    "pr_link": metadata["PR Link"],
-                })
-                id_count += 1
-            else:
-                logging.warning(f"Item without 'id' in {wrapped}: {obj!r}")
+        rows.extend(file_rows)
+        id_count += len(file_rows)
 
 # Write CSV
 with outfile.open("w", newline="", encoding="utf-8") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=["task_id", "task_link", "repo", "pr_link"])
-    writer.writeheader()
+    writer = csv.writer(csvfile)
+    writer.writerow(("task_id", "task_link", "repo", "pr_link"))
     writer.writerows(rows)
 
 logging.info(f"Scanned {len(batch_dirs)} batch folders")
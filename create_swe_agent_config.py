@@ -9,52 +9,53 @@ All paths are hard-coded by design.
 import json
 import os
 import shutil
-import subprocess
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from itertools import islice
 from pathlib import Path
 
+import docker  # pip install docker
 import yaml   # pip install pyyaml
 
+# libyaml-backed emitter when available, pure-Python otherwise
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 # ---------------------------------------------------------------------------
 # hard-coded locations – adjust once here if you ever move things around
 # ---------------------------------------------------------------------------
 JSONL_PATH            = Path("files/delivery/batch_1/batch_1-final.jsonl")          # source list of tasks
 DOCKER_SNIPPET_PATH   = Path("docker_files/Dockerfile-SWE-Agent")# reusable snippet
 YAML_OUTPUT_PATH      = Path("files/swe-agent/batch_1.yaml")
-DOCKER_BUILD_CTX      = Path("files/swe-agent/dockerfiles/")
 LIMIT = 2
+MAX_PARALLEL_BUILDS = 4   # builds are daemon-bound; run a few side by side
 # --------------------------------------------------------------------------- #
-def run(cmd, cwd=None):
-    """subprocess.run with decent error reporting."""
-    print(f"» {' '.join(cmd)}" + (f"  (cwd={cwd})" if cwd else ""))
-    subprocess.run(cmd, cwd=cwd, check=True)
-
-
-def build_image(patched_dockerfile_text: str, repo: str, commit: str, tag: str):
+def build_image(client: docker.DockerClient, patched_dockerfile_text: str,
+                repo: str, commit: str, tag: str):
     """
-    Build *tag* from *patched_dockerfile_text* in an ephemeral directory,
-    passing the REPO and COMMIT build args.
+    Build *tag* from *patched_dockerfile_text* over the shared daemon
+    connection, passing the REPO and COMMIT build args. The Dockerfile
+    needs no local files, so it is streamed without a build context.
     """
-    with tempfile.TemporaryDirectory(dir=DOCKER_BUILD_CTX) as tmpdir:
-        tmpdir_path = Path(tmpdir)
-        dockerfile_path = tmpdir_path / "Dockerfile"
-        dockerfile_path.write_text(patched_dockerfile_text, encoding="utf-8")
-
-        run([
-            "docker", "build",
-            "--build-arg", f"REPO={repo}",
-            "--build-arg", f"COMMIT={commit}",
-            "-t", tag,
-            "."  # context = tmpdir
-        ], cwd=tmpdir)
+    print(f"» docker build -t {tag}  (REPO={repo}, COMMIT={commit})")
+    try:
+        client.images.build(
+            fileobj=BytesIO(patched_dockerfile_text.encode("utf-8")),
+            buildargs={"REPO": repo, "COMMIT": commit},
+            tag=tag,
+            rm=True,
+        )
+    except docker.errors.BuildError as exc:
+        for chunk in exc.build_log:
+            print(chunk.get("stream", ""), end="")
+        raise
 
 
 def main() -> None:
-    DOCKER_BUILD_CTX.mkdir(exist_ok=True)
     snippet = DOCKER_SNIPPET_PATH.read_text(encoding="utf-8")
+    client = docker.from_env()
 
     yaml_entries = []
+    builds = []
 
     with JSONL_PATH.open("r", encoding="utf-8") as fh:
         for raw_line in islice(fh, LIMIT):
@@ -68,13 +69,12 @@ def main() -> None:
             patched_dockerfile = f"{dockerfile_src}\n\n{snippet}"
             image_tag = f"{instance_id}:latest".lower()
 
-            print(f"\n### Building {image_tag} ###")
-            build_image(
+            builds.append(dict(
                 patched_dockerfile_text=patched_dockerfile,
                 repo=repo,
                 commit=base_commit,
                 tag=image_tag
-            )
+            ))
 
             yaml_entries.append({
                 "image_name": image_tag,
@@ -82,8 +82,13 @@ def main() -> None:
                 "problem_statement": problem_text,
             })
 
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_BUILDS) as pool:
+        futures = [pool.submit(build_image, client, **b) for b in builds]
+        for f in futures:
+            f.result()  # re-raise the first failed build
+
     YAML_OUTPUT_PATH.write_text(
-        yaml.dump(yaml_entries, sort_keys=False,
+        yaml.dump(yaml_entries, Dumper=YamlDumper, sort_keys=False,
         default_flow_style=False, ),
         encoding="utf-8"
     )
@@ -3,33 +3,47 @@
 generate_patches_from_lists.py  - robust + explicit error logging
 
 - No `git restore` / no worktrees (diff commits directly).
+- Existence checks and diffs run in-process via pygit2 (one handle per mirror);
+  only clone/fetch shell out to git.
 - Fetches PR refs when needed (fork PRs).
 - Filters path list to ones present in at least one side.
 - Logs clear WARN/ERROR messages:
     * If a patch can't be created, prints [WARN] with reason(s).
     * If neither gold nor test patch is created for a PR, prints [ERROR] with all reasons.
 
-Input JSON entries must include:
+Reads <batch>.jsonl and writes each patched entry to <batch>-final.jsonl
+(one JSON object per line) in input order, as soon as all entries before it are done.
+
+Input JSONL entries must include:
   - task_id, repo, base_commit, patch_commit
   - modified_code: List[str]
   - modified_tests: List[str]   (we also accept "modified_test")
 """
 
-import json
+import os
 import subprocess
 import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
+import orjson
+import pygit2
 from tqdm import tqdm
 
 from delivery.config import BATCH_NAME
+from delivery.dockerfiles import inline_dockerfile
 
 # --------------- Configuration & Paths ---------------
 DEL_ROOT     = Path("../files/delivery") / BATCH_NAME
 REPOS_ROOT   = Path("../files/repos")
-IN_FILE      = DEL_ROOT / f"{BATCH_NAME}.json"
-OUT_FILE     = DEL_ROOT / f"{BATCH_NAME}-patched.json"
+IN_FILE      = DEL_ROOT / f"{BATCH_NAME}.jsonl"
+OUT_FILE     = DEL_ROOT / f"{BATCH_NAME}-final.jsonl"
+DOCKERFILES_DIR = DEL_ROOT / "dockerfiles"   # written by create_delivery
+
+_REPOS: Dict[Path, pygit2.Repository] = {}
+_FETCHED: set[Path] = set()   # mirrors already refreshed in this process
 
 # --------------- Small utils ---------------
 def _print_err(msg: str) -> None:
@@ -63,28 +77,36 @@ def ensure_repo(repo: str) -> Path:
         _run(["git", "--git-dir", str(mirror),
               "config", "--add", "remote.origin.fetch", "+refs/pull/*:refs/pull/*"], check=False)
 
-    # Keep the mirror reasonably fresh.
-    _run(["git", "--git-dir", str(mirror), "fetch", "--prune", "origin"], check=False)
+    # Keep the mirror reasonably fresh (once per run, not once per entry).
+    if mirror not in _FETCHED:
+        _run(["git", "--git-dir", str(mirror), "fetch", "--prune", "origin"], check=False)
+        _FETCHED.add(mirror)
 
     return mirror
 
-def _commit_exists(mirror: Path, rev: str) -> bool:
-    return subprocess.run(
-        ["git", "--git-dir", str(mirror), "cat-file", "-e", f"{rev}^{{commit}}"],
-        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-    ).returncode == 0
+def _open_repo(mirror: Path) -> pygit2.Repository:
+    """One persistent libgit2 handle per mirror (objects fetched later are still found)."""
+    if mirror not in _REPOS:
+        _REPOS[mirror] = pygit2.Repository(str(mirror))
+    return _REPOS[mirror]
 
-def _blob_exists(mirror: Path, rev: str, path: str) -> bool:
-    return subprocess.run(
-        ["git", "--git-dir", str(mirror), "cat-file", "-e", f"{rev}:{path}"],
-        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-    ).returncode == 0
+def _get_commit(mirror: Path, rev: str) -> Optional[pygit2.Commit]:
+    try:
+        return _open_repo(mirror).revparse_single(rev).peel(pygit2.Commit)
+    except (KeyError, ValueError, pygit2.GitError):
+        return None
+
+def _commit_exists(mirror: Path, rev: str) -> bool:
+    return _get_commit(mirror, rev) is not None
 
 def _ensure_commits_available(mirror: Path, base: str, head: str, pr_id: Optional[str], reasons: List[str]) -> None:
     """
-    Best-effort: fetch origin and, if head is missing and we have a PR id,
-    fetch the PR head/merge refs.
+    Best-effort: if either commit is missing, fetch origin and, if head is
+    still missing and we have a PR id, fetch the PR head/merge refs.
     """
+    if _commit_exists(mirror, base) and _commit_exists(mirror, head):
+        return
+
     _run(["git", "--git-dir", str(mirror), "fetch", "--prune", "origin"], check=False)
 
     if not _commit_exists(mirror, base):
@@ -110,113 +132,167 @@ def _unique_preserve_order(items: List[str]) -> List[str]:
             out.append(x)
     return out
 
-def run_git_diff(
+def _scoped_diff(repo: pygit2.Repository, base: pygit2.Commit, head: pygit2.Commit,
+                 paths: List[str]) -> str:
+    """
+    `git diff --find-renames <base> <head> -- <paths>`: the index starts as base and
+    takes head's version of <paths> only, so rename detection sees just these paths.
+    """
+    index = repo.index   # in-memory for a bare mirror; nothing is written back
+    index.read_tree(base.tree)
+    for p in paths:
+        if p in head.tree:
+            obj = head.tree[p]
+            index.add(pygit2.IndexEntry(p, obj.id, obj.filemode))
+        elif p in index:
+            index.remove(p)
+    diff = index.diff_to_tree(base.tree, context_lines=3)
+    diff.find_similar()  # --find-renames
+    return diff.patch or ""
+
+def run_git_diffs(
     mirror: Path,
     base: str,
     head: str,
-    paths: List[str],
+    path_groups: Dict[str, List[str]],
     pr_id: Optional[str] = None,
-) -> (str, List[str]):
+) -> Dict[str, Tuple[str, List[str]]]:
     """
-    Produce a unified diff for <paths> between <base> and <head>.
-    Returns (diff_text, reasons). reasons is non-empty when something prevented diffing.
+    One unified diff of <base>..<head> per named path list in <path_groups>
+    (e.g. {"gold": code_paths, "test": test_paths}), each scoped to its own paths.
+    Returns {name: (diff_text, reasons)}. reasons is non-empty when something prevented diffing.
     If diff_text is empty but there were valid paths and commits, that likely means "no changes".
     """
     reasons: List[str] = []
     _ensure_commits_available(mirror, base, head, pr_id, reasons)
 
-    if not _commit_exists(mirror, base) or not _commit_exists(mirror, head):
-        return ("", reasons or ["commits not available after fetch"])
+    base_commit = _get_commit(mirror, base)
+    head_commit = _get_commit(mirror, head)
+    if base_commit is None or head_commit is None:
+        return {name: ("", list(reasons or ["commits not available after fetch"])) for name in path_groups}
+
+    out: Dict[str, Tuple[str, List[str]]] = {}
+    for name, paths in path_groups.items():
+        group_reasons = list(reasons)
+        paths = _unique_preserve_order(paths or [])
+        # Filter to paths present in either tree (handles add/delete/rename).
+        filtered = [p for p in paths if p in base_commit.tree or p in head_commit.tree]
+        text = ""
+        if not paths:
+            group_reasons.append("no paths provided")
+        elif not filtered:
+            group_reasons.append("none of the provided paths exist in base or head")
+        else:
+            try:
+                text = _scoped_diff(_open_repo(mirror), base_commit, head_commit, filtered)
+            except (KeyError, ValueError, pygit2.GitError) as e:
+                group_reasons.append(f"git diff failed: {e}")
+        out[name] = (text, group_reasons)
 
-    # Filter to paths present in either tree (handles add/delete/rename).
-    paths = _unique_preserve_order(paths or [])
-    filtered = [p for p in paths if _blob_exists(mirror, base, p) or _blob_exists(mirror, head, p)]
-    if not paths:
-        reasons.append("no paths provided")
-        return ("", reasons)
-    if not filtered:
-        reasons.append("none of the provided paths exist in base or head")
-        return ("", reasons)
+    return out
 
-    try:
-        diff = subprocess.check_output(
-            ["git", "--git-dir", str(mirror),
-             "diff", "--no-color", "--find-renames", base, head, "--"] + filtered,
-            text=True
-        )
-        return (diff, reasons)
-    except subprocess.CalledProcessError as e:
-        reasons.append(f"git diff failed with code {e.returncode}")
-        return ("", reasons)
+# --------------- Per-entry work ---------------
+def process_entry(entry: Dict) -> Tuple[Dict, bool]:
+    """
+    Attach gold_patch/test_patch to <entry>.
+    Returns (entry, ok); ok is False when neither patch could be produced.
+    """
+    repo        = entry["repo"]
+    base_commit = entry["base_commit"]
+    head_commit = entry["patch_commit"]
+
+    # Accept both keys; prefer the plural if present.
+    code_paths  = entry.get("modified_code", []) or []
+    test_paths  = entry.get("modified_tests", entry.get("modified_test", [])) or []
+
+    # Heuristic: use task_id as PR number if it looks like one.
+    pr_id = None
+    tid = entry.get("task_id")
+    if isinstance(tid, int) or (isinstance(tid, str) and tid.isdigit()):
+        pr_id = str(tid)
+
+    mirror = ensure_repo(repo)
+
+    diffs = run_git_diffs(mirror, base_commit, head_commit,
+                          {"gold": code_paths, "test": test_paths}, pr_id=pr_id)
+    gold_patch, gold_reasons = diffs["gold"]
+    test_patch, test_reasons = diffs["test"]
+
+    # Per-patch warnings when empty
+    if not gold_patch:
+        if gold_reasons:
+            _print_err(f"[WARN] gold patch empty for {repo}#{entry.get('task_id')}: " +
+                       "; ".join(gold_reasons))
+        else:
+            _print_err(f"[WARN] gold patch empty (no changes) for {repo}#{entry.get('task_id')}")
+
+    if not test_patch:
+        if test_reasons:
+            _print_err(f"[WARN] test patch empty for {repo}#{entry.get('task_id')}: " +
+                       "; ".join(test_reasons))
+        else:
+            _print_err(f"[WARN] test patch empty (no changes) for {repo}#{entry.get('task_id')}")
+
+    # If neither patch could be produced, escalate to ERROR (per your request)
+    if not gold_patch and not test_patch:
+        all_reasons = list(dict.fromkeys((gold_reasons or []) + (test_reasons or [])))
+        if not all_reasons:
+            all_reasons = ["no diff produced for provided paths"]
+        _print_err(f"[ERROR] no patches created for {repo}#{entry.get('task_id')}: " +
+                   "; ".join(all_reasons))
+
+    entry["gold_patch"] = gold_patch
+    entry["test_patch"] = test_patch
+    return entry, bool(gold_patch or test_patch)
+
+def process_repo_group(entries: List[Dict]) -> List[Tuple[Dict, bool]]:
+    """Process all entries of one repo serially, so only one worker touches its mirror."""
+    return [process_entry(entry) for entry in entries]
 
 # --------------- Main ---------------
 def main():
     if not IN_FILE.exists():
         sys.exit(f"[ERROR] Input file not found: {IN_FILE}")
 
-    entries: List[Dict] = json.loads(IN_FILE.read_text(encoding="utf-8"))
-    patched: List[Dict] = []
+    with IN_FILE.open("rb") as rdr:
+        entries: List[Dict] = [orjson.loads(line) for line in rdr if line.strip()]
 
     REPOS_ROOT.mkdir(parents=True, exist_ok=True)
 
     total_errors = 0
+    written = 0
+    dockerfiles: Dict[str, str] = {}
 
-    for entry in tqdm(entries, desc="Generating patches"):
-        repo        = entry["repo"]
-        base_commit = entry["base_commit"]
-        head_commit = entry["patch_commit"]
-
-        # Accept both keys; prefer the plural if present.
-        code_paths  = entry.get("modified_code", []) or []
-        test_paths  = entry.get("modified_tests", entry.get("modified_test", [])) or []
-
-        # Heuristic: use task_id as PR number if it looks like one.
-        pr_id = None
-        tid = entry.get("task_id")
-        if isinstance(tid, int) or (isinstance(tid, str) and tid.isdigit()):
-            pr_id = str(tid)
-
-        mirror = ensure_repo(repo)
-
-        gold_patch, gold_reasons = run_git_diff(mirror, base_commit, head_commit, code_paths, pr_id=pr_id)
-        test_patch, test_reasons = run_git_diff(mirror, base_commit, head_commit, test_paths, pr_id=pr_id)
-
-        # Per-patch warnings when empty
-        if not gold_patch:
-            if gold_reasons:
-                _print_err(f"[WARN] gold patch empty for {repo}#{entry.get('task_id')}: " +
-                           "; ".join(gold_reasons))
-            else:
-                _print_err(f"[WARN] gold patch empty (no changes) for {repo}#{entry.get('task_id')}")
-
-        if not test_patch:
-            if test_reasons:
-                _print_err(f"[WARN] test patch empty for {repo}#{entry.get('task_id')}: " +
-                           "; ".join(test_reasons))
-            else:
-                _print_err(f"[WARN] test patch empty (no changes) for {repo}#{entry.get('task_id')}")
-
-        # If neither patch could be produced, escalate to ERROR (per your request)
-        if not gold_patch and not test_patch:
-            all_reasons = list(dict.fromkeys((gold_reasons or []) + (test_reasons or [])))
-            if not all_reasons:
-                all_reasons = ["no diff produced for provided paths"]
-            _print_err(f"[ERROR] no patches created for {repo}#{entry.get('task_id')}: " +
-                       "; ".join(all_reasons))
-            total_errors += 1
-
-        entry["gold_patch"] = gold_patch
-        entry["test_patch"] = test_patch
-        patched.append(entry)
+    # Entries are independent; parallelise across repos (grouped to avoid concurrent fetches of a mirror).
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for idx, entry in enumerate(entries):
+        groups[entry["repo"]].append(idx)
 
+    # Finished entries are parked by input index and flushed as soon as the
+    # next index in line is available, so the file keeps the input order.
+    pending: Dict[int, Tuple[Dict, bool]] = {}
     OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with OUT_FILE.open("w", encoding="utf-8") as f:
-        json.dump(patched, f, indent=4, ensure_ascii=False)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex, \
+            tqdm(total=len(entries), desc="Generating patches") as pbar, \
+            OUT_FILE.open("wb") as out:
+        futures = {ex.submit(process_repo_group, [entries[i] for i in idxs]): idxs
+                   for idxs in groups.values()}
+        for fut in as_completed(futures):
+            results = fut.result()
+            pending.update(zip(futures[fut], results))
+            while written in pending:
+                entry, ok = pending.pop(written)
+                entry = inline_dockerfile(entry, dockerfiles, DOCKERFILES_DIR)
+                out.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+                written += 1
+                if not ok:
+                    total_errors += 1
+            pbar.update(len(results))
 
     if total_errors > 0:
         _print_err(f"[ERROR] Finished with {total_errors} PR(s) producing no patches. Output: {OUT_FILE}")
     else:
-        print(f"✔ Wrote {len(patched)} entries with new patches → {OUT_FILE}")
+        print(f"✔ Wrote {written} entries with new patches → {OUT_FILE}")
 
 if __name__ == "__main__":
     main()
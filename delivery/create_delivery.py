@@ -1,5 +1,5 @@
 from pathlib import Path
-import json, yaml, jsonlines
+import hashlib, orjson, pickle, yaml
 from collections import Counter
 from typing import Dict, Any, Tuple, List
 
@@ -9,11 +9,13 @@ from utils import is_test
 # ------------------------------------------------------------------ paths
 # final_folder    = Path("../files/finals")
 final_folder    = Path("../files/finals-selected")
+index_file      = final_folder / ".index.pkl"
 delivery_folder = Path("../files/delivery")
 batch_folder    = delivery_folder / BATCH_NAME
 input_file      = batch_folder / "wrapped.json"
 repo_cfg_file   = Path("repo_config.yaml")
-out_file        = batch_folder / f"{BATCH_NAME}.json"
+out_file        = batch_folder / f"{BATCH_NAME}.jsonl"
+dockerfiles_dir = batch_folder / "dockerfiles"
 
 # ---------------------------------------------------------------- helpers
 
@@ -22,8 +24,7 @@ def load_yaml(path: Path) -> Dict[str, Any]:
         return yaml.safe_load(f) or {}
 
 def load_wrapped(path: Path) -> List[Dict[str, Any]]:
-    with path.open(encoding="utf-8") as f:
-        return json.load(f).get("form", [])
+    return orjson.loads(path.read_bytes()).get("form", [])
 
 def is_useful(task: Dict[str, Any]) -> bool:
     for r in task.get("formData", {}).get("ratings", []):
@@ -48,16 +49,60 @@ def repo_pr_key(task: Dict[str, Any]) -> Tuple[str, int] | None:
         return None
     return repo, prnum
 
+def _snapshot() -> Dict[str, int]:
+    # newest first: recent batches are where a key most likely lives, and they win on duplicates
+    mtimes = {jf.name: jf.stat().st_mtime_ns for jf in final_folder.glob("*.jsonl")}
+    return dict(sorted(mtimes.items(), key=lambda kv: (-kv[1], kv[0])))
+
+def load_payload_index() -> Dict[Tuple[str, int], Tuple[str, int]]:
+    """(repo, pr_number) -> (filename, byte offset), cached in final_folder/.index.pkl.
+
+    The cache is rebuilt whenever the set of *.jsonl files or any of their
+    mtimes changes; files are scanned newest first and the first occurrence
+    of a key wins.
+    """
+    snapshot = _snapshot()
+    try:
+        with index_file.open("rb") as f:
+            cached = pickle.load(f)
+        if cached["files"] == snapshot:
+            return cached["index"]
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError):
+        pass
+
+    index: Dict[Tuple[str, int], Tuple[str, int]] = {}
+    for name in snapshot:
+        with (final_folder / name).open("rb") as rdr:
+            while True:
+                offset = rdr.tell()
+                line = rdr.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                pr = orjson.loads(line)
+                index.setdefault((pr.get("repo"), pr.get("pr_number")), (name, offset))
+
+    with index_file.open("wb") as f:
+        pickle.dump({"files": snapshot, "index": index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return index
+
 def find_payloads(keys: set[Tuple[str, int]]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    index = load_payload_index()
     hits = {}
-    for jf in final_folder.glob("*.jsonl"):
-        with jsonlines.open(jf) as rdr:
-            for pr in rdr:
-                k = (pr.get("repo"), pr.get("pr_number"))
-                if k in keys and k not in hits:
-                    hits[k] = pr
-                if len(hits) == len(keys):
-                    return hits
+    handles = {}
+    # visit the wanted lines file by file, in offset order, so reads stay sequential
+    wanted = sorted((index[k], k) for k in keys if k in index)
+    try:
+        for (name, offset), k in wanted:
+            rdr = handles.get(name)
+            if rdr is None:
+                rdr = handles[name] = (final_folder / name).open("rb")
+            rdr.seek(offset)
+            hits[k] = orjson.loads(rdr.readline())
+    finally:
+        for rdr in handles.values():
+            rdr.close()
     return hits
 
 # ---------------------------------------------------------------- load config
@@ -83,85 +128,93 @@ for k, rec in useful.items():
     rec["payload"] = payloads.get(k)
 
 # ---------------------------------------------------------------- step 3 – build final objects
-prepared: List[Dict[str, Any]] = []
+# Many tasks share a repo's Dockerfile. Each distinct one is stored once as
+# dockerfiles/<blake2b>.Dockerfile and entries carry only its key; the patch
+# scripts inline the text again when writing the delivered file.
+dockerfiles_dir.mkdir(parents=True, exist_ok=True)
+docker_refs: Dict[Path, str] = {}
 
 
 def get_modified_files(files):
-    modified_code = []
-    modified_test = []
-    for f in files:
-        path = f["path"]
-        if is_test(path):
-            modified_test.append(path)
-        else:
-            modified_code.append(path)
+    paths = [f["path"] for f in files]
+    tests_mask = list(map(is_test, paths))
+    modified_code = [p for p, t in zip(paths, tests_mask) if not t]
+    modified_test = [p for p, t in zip(paths, tests_mask) if t]
 
     return modified_code, modified_test
 
 
-for (repo, prnum), rec in useful.items():
-    task = rec["task"]
-    pr   = rec["payload"]
-    cfg  = repo_cfg.get(repo)
-
-    if not pr:
-        stats["missing_payload"] += 1
-        print(f"[ERROR] No payload for {repo}#{prnum}; skipping")
-        continue
-    if not cfg:
-        stats["missing_cfg"] += 1
-        print(f"[ERROR] No Docker config for {repo}; skipping task {repo}#{prnum}")
-        continue
-
-    docker_path = cfg["dockerfile"]
-    if "/docker/" in docker_path:
-        docker_path = docker_path.replace("/docker/", "/docker_files/")
-    docker_path = Path(docker_path).expanduser().resolve()
-
-    try:
-        docker_text = docker_path.read_text(encoding="utf-8")
-    except FileNotFoundError:
-        stats["dockerfile_not_found"] += 1
-        print(f"[ERROR] Dockerfile not found at {docker_path}; skipping {repo}#{prnum}")
-        continue
-
-    if "files" in pr:
-        modified_code, modified_test = get_modified_files(pr["files"])
-    else:
-        modified_code = pr["modified_source"]
-        modified_test = pr["modified_test"]
-
-    prepared.append({
-        "task_id"          : f"{repo}#{prnum}",
-        "instance_id"      : f"{repo.replace('/', '__')}-{prnum}",
-        "repo"             : pr.get("repo"),
-        "patch_commit"     : pr.get("head_commit"),
-        "base_commit"      : pr.get("base_commit"),
-        "merge_commit"     : pr.get("merge_commit"),
-        "problem_statement": get_description(task),
-        "language"         : "Java",
-        "dockerfile"       : docker_text,           # ← full file contents
-        "test_command"     : pr["test_command"],
-        "fail_to_pass"     : pr.get("fail2pass", ["compile-error"]),
-        "pass_to_pass"     : pr.get("pass2pass", ["all-pass"]),
-        "hints"            : None,
-        "modified_test"    : modified_test,
-        "modified_code"    : modified_code,
-        "spec_dict": {
-            "install": [],
-            "test_cmd": pr["test_command"],
-            "docker_specs": {
-                "java_version": "21"
-            },
-            "log_parser_name": "maven"
-        }
-    })
-    stats["prepared"] += 1
-
-# ---------------------------------------------------------------- step 4 – write one indented JSON array
+# Entries are streamed out one JSON line at a time as soon as they are built,
+# so the dockerfile/payload strings of the whole batch are never held at once.
 out_file.parent.mkdir(parents=True, exist_ok=True)
-with out_file.open("w", encoding="utf-8") as f:
-    json.dump(prepared, f, indent=2, ensure_ascii=False)
+with out_file.open("wb") as writer:
+    for (repo, prnum), rec in useful.items():
+        task = rec["task"]
+        pr   = rec["payload"]
+        cfg  = repo_cfg.get(repo)
+
+        if not pr:
+            stats["missing_payload"] += 1
+            print(f"[ERROR] No payload for {repo}#{prnum}; skipping")
+            continue
+        if not cfg:
+            stats["missing_cfg"] += 1
+            print(f"[ERROR] No Docker config for {repo}; skipping task {repo}#{prnum}")
+            continue
+
+        docker_path = cfg["dockerfile"]
+        if "/docker/" in docker_path:
+            docker_path = docker_path.replace("/docker/", "/docker_files/")
+        docker_path = Path(docker_path).expanduser().resolve()
+
+        try:
+            docker_ref = docker_refs.get(docker_path)
+            if docker_ref is None:
+                docker_text = docker_path.read_text(encoding="utf-8")
+                docker_ref  = hashlib.blake2b(docker_text.encode("utf-8"), digest_size=16).hexdigest()
+                ref_path    = dockerfiles_dir / f"{docker_ref}.Dockerfile"
+                if not ref_path.exists():
+                    ref_path.write_text(docker_text, encoding="utf-8")
+                docker_refs[docker_path] = docker_ref
+        except FileNotFoundError:
+            stats["dockerfile_not_found"] += 1
+            print(f"[ERROR] Dockerfile not found at {docker_path}; skipping {repo}#{prnum}")
+            continue
+
+        # payloads that are already split need no per-path classification
+        if "modified_source" in pr:
+            modified_code = pr["modified_source"]
+            modified_test = pr["modified_test"]
+        else:
+            modified_code, modified_test = get_modified_files(pr["files"])
+
+        writer.write(orjson.dumps({
+            "task_id"          : f"{repo}#{prnum}",
+            "instance_id"      : f"{repo.replace('/', '__')}-{prnum}",
+            "repo"             : pr.get("repo"),
+            "patch_commit"     : pr.get("head_commit"),
+            "base_commit"      : pr.get("base_commit"),
+            "merge_commit"     : pr.get("merge_commit"),
+            "problem_statement": get_description(task),
+            "language"         : "Java",
+            "dockerfile_ref"   : docker_ref,            # ← dockerfiles/<ref>.Dockerfile
+            "test_command"     : pr["test_command"],
+            "fail_to_pass"     : pr.get("fail2pass", ["compile-error"]),
+            "pass_to_pass"     : pr.get("pass2pass", ["all-pass"]),
+            "hints"            : None,
+            "modified_test"    : modified_test,
+            "modified_code"    : modified_code,
+            "spec_dict": {
+                "install": [],
+                "test_cmd": pr["test_command"],
+                "docker_specs": {
+                    "java_version": "21"
+                },
+                "log_parser_name": "maven"
+            }
+        }, option=orjson.OPT_APPEND_NEWLINE))
+        stats["prepared"] += 1
+
 
 # ---------------------------------------------------------------- summary
 print("----------- summary -----------")
@@ -0,0 +1,13 @@
+from pathlib import Path
+from typing import Dict
+
+
+def inline_dockerfile(entry: Dict, cache: Dict[str, str], dockerfiles_dir: Path) -> Dict:
+    """Swap create_delivery's "dockerfile_ref" back for the Dockerfile text, keeping key order."""
+    ref = entry.get("dockerfile_ref")
+    if ref is None:
+        return entry
+    if ref not in cache:
+        cache[ref] = (dockerfiles_dir / f"{ref}.Dockerfile").read_text(encoding="utf-8")
+    return {("dockerfile" if k == "dockerfile_ref" else k): (cache[ref] if k == "dockerfile_ref" else v)
+            for k, v in entry.items()}
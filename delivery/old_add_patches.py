@@ -2,9 +2,12 @@
 """
 generate_patches_from_lists.py
 
-For each entry in batch_1-patched.json (JSON array), use its
+For each entry in batch_1.jsonl (one JSON object per line), use its
 modified_code / modified_tests lists to generate gold_patch and test_patch
-directly via `git diff` on those paths, using git restore to handle new files.
+directly via `git diff <base> <head>` on those paths in the bare mirror
+(no worktree needed; added files show up in a commit-to-commit diff).
+Entries are processed repo by repo, with one `git diff` per patch, each
+scoped to its own path list so rename detection stays within that side.
 
 Prerequisites:
   • a prior JSON with keys:
@@ -15,25 +18,31 @@ Prerequisites:
   • Repos will be cloned as bare mirrors under ../files/repos/owner__name.git
 """
 
-import json
+import functools
+import os
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import groupby
 from pathlib import Path
 from typing import List, Dict
 
+import orjson
 from tqdm import tqdm
 
 from delivery.config import BATCH_NAME
+from delivery.dockerfiles import inline_dockerfile
 
 # --------------- Configuration & Paths ---------------
 DEL_ROOT     = Path("../files/delivery") / BATCH_NAME
 REPOS_ROOT   = Path("../files/repos")
-IN_FILE      = DEL_ROOT / f"{BATCH_NAME}.json"
+IN_FILE      = DEL_ROOT / f"{BATCH_NAME}.jsonl"
 OUT_FILE     = DEL_ROOT / f"{BATCH_NAME}-patched-old.json"
-
-WORKTREE_DIR = REPOS_ROOT / "__worktrees__"
+DOCKERFILES_DIR = DEL_ROOT / "dockerfiles"   # written by create_delivery
 
 # --------------- Git Helpers ---------------
+@functools.lru_cache(maxsize=None)
 def ensure_repo(repo: str) -> Path:
     """
     Clone a bare mirror of the repository if it doesn't exist,
@@ -45,8 +54,8 @@ def ensure_repo(repo: str) -> Path:
         mirror.parent.mkdir(parents=True, exist_ok=True)
         print(f"Cloning {repo}…")
         subprocess.run(
-            ["git", "clone", "--mirror", f"https://github.com/{repo}.git", str(mirror)],
-            check=True,
+            ["git", "clone", "--quiet", "--mirror", f"https://github.com/{repo}.git", str(mirror)],
+            check=True, stdout=subprocess.DEVNULL,
         )
     return mirror
 
@@ -57,98 +66,82 @@ def run_git_diff(
     paths: List[str]
 ) -> str:
     """
-    Create (or reuse) a detached worktree at base_commit, restore only
-    the given paths from head_commit using git restore, diff those paths,
-    then reset.
+    Unified diff of <paths> between two commits, straight from the bare mirror.
     """
-    # 1) Prepare worktree directory
-    wt = WORKTREE_DIR / mirror.name
-    if not wt.exists():
-        wt.parent.mkdir(parents=True, exist_ok=True)
-        subprocess.run(
-            ["git", "--git-dir", str(mirror),
-             "worktree", "add", "--detach", "--quiet", str(wt), base],
-            check=True
-        )
-
-    # 2) Restore only the selected files to head (handles new files)
-    subprocess.run(
+    return subprocess.check_output(
         ["git", "--git-dir", str(mirror),
-         "--work-tree", str(wt),
-         "restore", "--source", head, "--"] + paths,
-        check=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL
-    )
-
-    # 3) Run diff for those paths
-    diff = subprocess.check_output(
-        ["git", "--git-dir", str(mirror),
-         "--work-tree", str(wt),
          "diff", "--no-color", "--find-renames", base, head, "--"] + paths,
         text=True
     )
 
-    # 4) Reset worktree back to base for next entry
-    subprocess.run(
-        ["git", "--git-dir", str(mirror),
-         "--work-tree", str(wt),
-         "reset", "--hard", base],
-        check=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL
-    )
-
-    return diff
-
-# --------------- Main ---------------
-def main():
-    if not IN_FILE.exists():
-        sys.exit(f"[ERROR] Input file not found: {IN_FILE}")
-
-    # Load JSON array of entries
-    entries: List[Dict] = json.loads(IN_FILE.read_text(encoding="utf-8"))
-    patched: List[Dict] = []
-
-    # Ensure directories exist
-    REPOS_ROOT.mkdir(parents=True, exist_ok=True)
-    WORKTREE_DIR.mkdir(parents=True, exist_ok=True)
-
-    for entry in tqdm(entries, desc="Generating patches"):
-        repo        = entry["repo"]
+def process_repo(repo: str, entries: List[Dict], pbar: "tqdm", lock: threading.Lock) -> None:
+    """
+    Attach gold_patch/test_patch to every entry of one repo, in place.
+    Runs serially within the repo; different repos run on different threads.
+    """
+    for entry in entries:
         base_commit = entry["base_commit"]
         head_commit = entry["patch_commit"]
         code_paths  = entry.get("modified_code", [])
         test_paths  = entry.get("modified_test", [])
 
+        # Nothing to diff: don't clone a mirror just for empty patches
+        if not code_paths and not test_paths:
+            entry["gold_patch"] = entry["test_patch"] = ""
+            with lock:
+                pbar.update(1)
+            continue
+
         mirror = ensure_repo(repo)
 
-        # Generate gold_patch for production code changes
-        gold_patch = ""
-        if code_paths:
+        # One scoped diff per side; an empty pathspec would diff the whole tree
+        patches = {}
+        for key, paths in (("gold_patch", code_paths), ("test_patch", test_paths)):
+            patches[key] = ""
+            if not paths:
+                continue
             try:
-                gold_patch = run_git_diff(mirror, base_commit, head_commit, code_paths)
+                patches[key] = run_git_diff(mirror, base_commit, head_commit, paths)
             except subprocess.CalledProcessError as e:
-                print(f"[WARN] gold diff failed for {repo}#{entry['task_id']}: {e}")
+                print(f"[WARN] {key} diff failed for {repo}#{entry['task_id']}: {e}")
 
-        # Generate test_patch for test changes
-        test_patch = ""
-        if test_paths:
-            try:
-                test_patch = run_git_diff(mirror, base_commit, head_commit, test_paths)
-            except subprocess.CalledProcessError as e:
-                print(f"[WARN] test diff failed for {repo}#{entry['task_id']}: {e}")
+        entry.update(patches)
+        with lock:
+            pbar.update(1)
 
-        entry["gold_patch"] = gold_patch
-        entry["test_patch"] = test_patch
-        patched.append(entry)
+# --------------- Main ---------------
+def main():
+    if not IN_FILE.exists():
+        sys.exit(f"[ERROR] Input file not found: {IN_FILE}")
+
+    # Load JSONL entries
+    with IN_FILE.open("rb") as rdr:
+        entries: List[Dict] = [orjson.loads(line) for line in rdr if line.strip()]
+
+    # Ensure directories exist
+    REPOS_ROOT.mkdir(parents=True, exist_ok=True)
 
-    # Write out final JSON array, indented with 4 spaces
+    # Group entries by repo (base commits adjacent). git mostly waits on
+    # subprocesses, so repos run concurrently on threads; within a repo the
+    # entries stay serial. Entries are updated in place, keeping input order.
+    ordered = sorted(entries, key=lambda e: (e["repo"], e["base_commit"]))
+    groups = {repo: list(group) for repo, group in groupby(ordered, key=lambda e: e["repo"])}
+
+    lock = threading.Lock()
+    with tqdm(total=len(entries), desc="Generating patches") as pbar, \
+            ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        futures = [pool.submit(process_repo, repo, group, pbar, lock)
+                   for repo, group in groups.items()]
+        for f in as_completed(futures):
+            f.result()
+
+    # Write out final JSON array, indented with 2 spaces
     OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with OUT_FILE.open("w", encoding="utf-8") as f:
-        json.dump(patched, f, indent=4, ensure_ascii=False)
+    dockerfiles: Dict[str, str] = {}
+    entries = [inline_dockerfile(e, dockerfiles, DOCKERFILES_DIR) for e in entries]
+    OUT_FILE.write_bytes(orjson.dumps(entries, option=orjson.OPT_INDENT_2))
 
-    print(f"✔ Wrote {len(patched)} entries with new patches → {OUT_FILE}")
+    print(f"✔ Wrote {len(entries)} entries with new patches → {OUT_FILE}")
 
 if __name__ == "__main__":
     main()
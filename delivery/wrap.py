@@ -1,4 +1,4 @@
-import json
+import shutil
 from pathlib import Path
 
 from delivery.config import BATCH_NAME
@@ -7,11 +7,6 @@ folder = f"../files/delivery/{BATCH_NAME}"
 in_file = Path("%s/raw_1.json" % folder)
 out_file = Path("%s/wrapped.json" % folder)
 
-with in_file.open("r", encoding="utf-8") as infile, \
-    out_file.open("w", encoding="utf-8") as outfile:
-
-    data = json.load(infile)
-
-    json.dump(data, outfile, indent=4)
-
-    
\ No newline at end of file
+# wrapped.json is only ever parsed again (create_delivery, create_rework), so
+# re-indenting it buys nothing; copy the bytes as they are.
+shutil.copyfile(in_file, out_file)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Hard-coded repo distribution plotter for two sources:
-1. batch_* sub-folders with *.jsonl files            (original source)
+1. batch_* sub-folders with *-final.jsonl files      (original source)
 2. A list of CSV files located in a single folder    (new source)
 
 Run:
@@ -12,6 +12,8 @@ from collections import Counter
 from pathlib import Path
 import csv
 import json
+import os
+import re
 import matplotlib.pyplot as plt
 
 # ─── HARD-CODED SETTINGS ───────────────────────────────────────────────────────
@@ -30,26 +32,32 @@ INITIAL_COUNTS = {
 }
 # ────────────────────────────────────────────────────────────────────────────────
 
+REPO_RE = re.compile(rb'"repo"\s*:\s*"([^"]+)"')
 
-def collect_from_jsonl(counts: Counter) -> None:
-    """Increment counts from batch_*/*.jsonl under ROOT_DIR (mutates counts)."""
-    for batch_dir in ROOT_DIR.glob("batch_*"):
-        if not batch_dir.is_dir():
-            continue
 
-        jsonl_files = list(batch_dir.glob("*.jsonl"))
+def collect_from_jsonl(counts: Counter) -> None:
+    """Increment counts from batch_*/*-final.jsonl under ROOT_DIR (mutates counts)."""
+    # os.scandir hands back the dirent type, so filtering needs no extra stat() per child
+    with os.scandir(ROOT_DIR) as it:
+        batch_dirs = [e.path for e in it
+                      if e.name.startswith("batch_") and e.is_dir(follow_symlinks=False)]
+
+    for batch_dir in batch_dirs:
+        # batch dirs also hold the pre-patch <batch>.jsonl; count delivered tasks only
+        with os.scandir(batch_dir) as it:
+            jsonl_files = [e.path for e in it if e.name.endswith("-final.jsonl") and e.is_file()]
         if len(jsonl_files) != 1:
-            print(f"[warning] {batch_dir} has {len(jsonl_files)} .jsonl files; skipping")
+            print(f"[warning] {batch_dir} has {len(jsonl_files)} -final.jsonl files; skipping")
             continue
 
-        jsonl_path = jsonl_files[0]
-        with jsonl_path.open(encoding="utf-8") as fh:
+        jsonl_path = Path(jsonl_files[0])
+        with jsonl_path.open("rb") as fh:
             for line in fh:
-                try:
-                    repo_full = json.loads(line)["repo"]
-                    repo = repo_full.split("/")[-1]
-                    counts[repo] += 1
-                except Exception:
+                # pull out just "repo" (it precedes the long text fields) without parsing the line
+                m = REPO_RE.search(line)
+                if m:
+                    counts[m.group(1).decode().rsplit("/", 1)[-1]] += 1
+                else:
                     print(f"[warning] bad line in {jsonl_path}")
 
 
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import argparse, json, math, os, subprocess, threading, time
+import argparse, io, json, math, os, shutil, subprocess, threading, time
 from datetime import datetime
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -31,7 +31,7 @@ def build_image(base_df: Path):
     GEN_DOCKER.write_text(
         base_df.read_text() +
         "\n# --- auto‑added ---\n"
-        "RUN sudo apt-get update -y && sudo apt-get install -y --no-install-recommends python3-pip && pip3 install tqdm\n"
+        "RUN sudo apt-get update -y && sudo apt-get install -y --no-install-recommends python3-pip && pip3 install tqdm lxml\n"
         "WORKDIR /runner\n"
         "COPY run_in_container.py /runner/run_in_container.py\n"
         "WORKDIR /workspace\n"
@@ -51,7 +51,8 @@ def run_worker(idx: int,
                overall_pbar: "tqdm",
                worker_pbar: "tqdm",
                counts: dict,
-               lock: threading.Lock):
+               lock: threading.Lock,
+               pr_procs: int = 1):
 
     part_path = RUN_DIR / PART_TPL.format(idx)
 
@@ -60,7 +61,8 @@ def run_worker(idx: int,
     # docker_env = ["-e", "DOCKER_HOST=unix:///var/run/docker.sock"]
 
     env  = ["-e", f"PR_LIST={','.join(map(str, prs))}",
-            "-e", f"PART_FILE=/workspace/{part_path.name}"]
+            "-e", f"PART_FILE=/workspace/{part_path.name}",
+            "-e", f"PR_PROCS={pr_procs}"]
     vol  = ["-v", f"{RUN_DIR}:/workspace:rw"]
     m2_vol = ["-v", f"{M2_DIR}:/home/circleci/.m2/repository:rw"]
     sock_vol = ["-v", "/var/run/docker.sock:/var/run/docker.sock"]
@@ -72,7 +74,7 @@ def run_worker(idx: int,
 
     proc = subprocess.Popen(
         cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-        text=True, bufsize=1, universal_newlines=True
+        text=True, bufsize=io.DEFAULT_BUFFER_SIZE
     )
 
     for line in proc.stdout:
@@ -102,6 +104,8 @@ def run_worker(idx: int,
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("-w", "--workers", type=int, default=2)
+    ap.add_argument("-p", "--pr-procs", type=int, default=1,
+                    help="PRs built at once inside each container (each runs two Maven builds)")
     ap.add_argument("-i", "--input",  default="files/inputs.json")
     args = ap.parse_args()
 
@@ -142,16 +146,17 @@ def main():
         futures = []
         for idx, (chunk_list, wbar) in enumerate(zip(chunks(pr_numbers, args.workers), worker_bars), start=1):
             futures.append(pool.submit(run_worker, idx, list(chunk_list),
-                                       run_name, overall_pbar, wbar, counts, lock))
+                                       run_name, overall_pbar, wbar, counts, lock, args.pr_procs))
         for f in as_completed(futures):
             f.result()
 
     overall_pbar.close()
 
     # merge partial outputs
-    with FINAL_PATH.open("w", encoding="utf-8") as out:
+    with FINAL_PATH.open("wb") as out:
         for part in sorted(RUN_DIR.glob("final.part*.jsonl")):
-            out.write(part.read_text())
+            with part.open("rb") as src:
+                shutil.copyfileobj(src, out, 1 << 20)
             part.unlink()
 
     print(f"\n🎉  done → {FINAL_PATH}")
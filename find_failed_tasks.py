@@ -10,8 +10,12 @@ then filter a hardcoded JSONL file to keep only those unresolved items.
 
 from __future__ import annotations
 from pathlib import Path
-import json
-from itertools import chain
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import orjson
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Hardcoded paths — adjust these constants if your layout differs
@@ -24,6 +28,7 @@ UNRESOLVED_TXT   = OUT_DIR / "unresolved_instance_ids.txt"
 UNRESOLVED_JSON  = OUT_DIR / "unresolved_instance_ids.json"
 FILTERED_JSONL   = OUT_DIR / "batch_5-final.filtered_unresolved.jsonl"
 SUMMARY_JSON     = OUT_DIR / "per_report_unresolved_summary.json"
+REPORT_NAMES     = ("report.json", "repot.json")
 # ──────────────────────────────────────────────────────────────────────────────
 
 def load_unresolved_from_report(report_path: Path) -> list[str]:
@@ -38,18 +43,21 @@ def load_unresolved_from_report(report_path: Path) -> list[str]:
     }
     Return list of keys whose 'resolved' is False (missing treated as False).
     """
-    with report_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = orjson.loads(report_path.read_bytes())
 
-    unresolved: list[str] = []
-    if isinstance(data, dict):
-        for instance_id, details in data.items():
-            if not isinstance(details, dict):
-                continue
-            # Treat missing 'resolved' as False → unresolved
-            if details.get("resolved", False) is False:
-                unresolved.append(str(instance_id))
-    return unresolved
+    if not isinstance(data, dict):
+        return []
+    # Treat missing 'resolved' as False → unresolved
+    return [str(instance_id) for instance_id, details in data.items()
+            if isinstance(details, dict) and details.get("resolved", False) is False]
+
+
+def _load_report(report_path: Path) -> tuple[Path, list[str] | None, Exception | None]:
+    """Pool worker: never raises, so one bad report doesn't abort the map."""
+    try:
+        return report_path, load_unresolved_from_report(report_path), None
+    except Exception as e:
+        return report_path, None, e
 
 
 def collect_all_unresolved(root: Path) -> tuple[set[str], dict[str, list[str]]]:
@@ -58,18 +66,21 @@ def collect_all_unresolved(root: Path) -> tuple[set[str], dict[str, list[str]]]:
     collect all unresolved instance_ids into a set.
     Also return a per-file summary (for debugging/auditing).
     """
-    report_files = list(chain(root.rglob("report.json"), root.rglob("repot.json")))
+    # one walk of the tree for both spellings (rglob would traverse it twice)
+    report_files = [Path(dirpath, name)
+                    for dirpath, _, filenames in os.walk(root)
+                    for name in REPORT_NAMES if name in filenames]
     per_file: dict[str, list[str]] = {}
     all_unresolved: set[str] = set()
 
-    for rp in sorted(report_files):
-        try:
-            items = load_unresolved_from_report(rp)
-        except Exception as e:
-            print(f"[WARN] Skipping {rp}: {e}")
-            continue
-        per_file[str(rp)] = items
-        all_unresolved.update(items)
+    # Reports are independent and parsing is CPU-bound: fan out across processes
+    with ProcessPoolExecutor() as ex:
+        for rp, items, err in ex.map(_load_report, sorted(report_files), chunksize=16):
+            if err is not None:
+                print(f"[WARN] Skipping {rp}: {err}")
+                continue
+            per_file[str(rp)] = items
+            all_unresolved.update(items)
 
     return all_unresolved, per_file
 
@@ -78,22 +89,35 @@ def filter_jsonl_by_instance_ids(src_jsonl: Path, keep_ids: set[str], dst_jsonl:
     """
     Read JSONL lines; keep only those whose 'instance_id' is in keep_ids.
     Return count of kept lines.
+
+    The file is mmapped and scanned for `"instance_id": "<id>"` byte patterns
+    first; only the lines that match are JSON-parsed (to confirm the match is
+    the top-level field).
     """
     kept = 0
-    with src_jsonl.open("r", encoding="utf-8") as fin, dst_jsonl.open("w", encoding="utf-8") as fout:
-        for line in fin:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-            except json.JSONDecodeError:
-                # Non-JSON line; skip silently
-                continue
-            instance_id = obj.get("instance_id")
-            if instance_id in keep_ids:
-                fout.write(json.dumps(obj, ensure_ascii=False) + "\n")
-                kept += 1
+    with src_jsonl.open("rb") as fin, dst_jsonl.open("wb") as fout:
+        if not keep_ids or src_jsonl.stat().st_size == 0:
+            return kept
+        pattern = re.compile(
+            rb'"instance_id"\s*:\s*(' + b"|".join(re.escape(orjson.dumps(i)) for i in sorted(keep_ids)) + rb")"
+        )
+        with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            last_start = -1
+            for m in pattern.finditer(mm):
+                start = mm.rfind(b"\n", 0, m.start()) + 1
+                if start == last_start:
+                    continue  # several matches on one line
+                last_start = start
+                end = mm.find(b"\n", m.end())
+                line = mm[start:end if end != -1 else len(mm)]
+                try:
+                    obj = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # Non-JSON line; skip silently
+                    continue
+                if obj.get("instance_id") in keep_ids:
+                    fout.write(orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE))
+                    kept += 1
     return kept
 
 
@@ -103,8 +127,8 @@ def main() -> None:
 
     # 2) Persist unresolved sets for visibility/debugging
     UNRESOLVED_TXT.write_text("\n".join(sorted(all_unresolved)), encoding="utf-8")
-    UNRESOLVED_JSON.write_text(json.dumps(sorted(all_unresolved), ensure_ascii=False, indent=2), encoding="utf-8")
-    SUMMARY_JSON.write_text(json.dumps(per_file, ensure_ascii=False, indent=2), encoding="utf-8")
+    UNRESOLVED_JSON.write_bytes(orjson.dumps(sorted(all_unresolved), option=orjson.OPT_INDENT_2))
+    SUMMARY_JSON.write_bytes(orjson.dumps(per_file, option=orjson.OPT_INDENT_2))
 
     print(f"[INFO] Found {len(all_unresolved)} unresolved instance_id(s).")
     print(f"[INFO] Wrote list to: {UNRESOLVED_TXT}")
@@ -1,6 +1,9 @@
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import jsonlines
+import orjson
+
 # DELIVERIES = [f"batch_{i}" for i in range(1, 6)]
 DELIVERIES = [f"batch_5"]
 DELIVERY_FOLDER = Path("files/delivery")
@@ -10,40 +13,42 @@ FIXED_FOLDER = Path("files/fixed_inputs")
 def fix_tasks(tasks, fixed_inputs):
     report = {"fixed": 0, "not_fixed": 0}
     for t in tasks:
-        if t["task_id"] in fixed_inputs:
-            t["modified_code"] = fixed_inputs[t["task_id"]]["modified_source"]
+        repo, _, pr = t["task_id"].rpartition("#")
+        hit = fixed_inputs.get((repo, pr))
+        if hit is not None:
+            t["modified_code"] = hit["modified_source"]
             report["fixed"] += 1
         else:
             report["not_fixed"] += 1
 
     return tasks, report
 
+# The fixed inputs are the same for every delivery: read them once, in parallel
+with ThreadPoolExecutor(16) as ex:
+    datas = ex.map(lambda p: orjson.loads(p.read_bytes()), FIXED_FOLDER.glob("*.json"))
+    # keyed like task_id ("<repo>#<pr>") but as a (repo, str(pr)) tuple, so nothing is formatted
+    fixed_inputs = {(item["repo"], str(item["pr_number"])): item for data in datas for item in data}
+
 for delivery in DELIVERIES:
     delivery_folder = DELIVERY_FOLDER / delivery
-    in_file = delivery_folder / f"{delivery}.json"
-    out_file = delivery_folder / f"{delivery}-fixed.json"
+    in_file = delivery_folder / f"{delivery}.jsonl"
+    out_file = delivery_folder / f"{delivery}-fixed.jsonl"
 
     if not in_file.exists():
         print(f"[ERROR] input file {in_file} not found")
         continue
 
-    with in_file.open("r", encoding="utf-8") as f:
-        tasks = json.load(f)
-
+    with jsonlines.open(in_file) as rdr:
+        tasks = list(rdr)
 
-    fixed_inputs = {}
-    for file in (FIXED_FOLDER).glob("*.json"):
-        with file.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            fixed_inputs.update({f"{item["repo"]}#{item["pr_number"]}": item for item in data})
 
     tasks, fix_report = fix_tasks(tasks, fixed_inputs)
 
     print(f"✓ fixed {fix_report['fixed']} tasks; {fix_report['not_fixed']} not fixed")
 
     out_file.parent.mkdir(parents=True, exist_ok=True)
-    with out_file.open("w", encoding="utf-8") as f:
-        json.dump(tasks, f, indent=4)
+    with jsonlines.open(out_file, mode="w") as writer:
+        writer.write_all(tasks)
 
 
     print(f"✓ wrote {len(tasks)} objects → {out_file}")
\ No newline at end of file
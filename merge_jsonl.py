@@ -1,18 +1,24 @@
+import shutil
 from pathlib import Path
 
 input_folder = Path("files/dp-selected")
 output_file = Path("files/finals-selected/dp.jsonl")
 
 def merge_jsonl_files(input_folder: Path, output_file: Path) -> None:
-    with output_file.open("w", encoding="utf-8") as outfile:
+    # Plain byte concatenation: the lines are never decoded. Blank lines are
+    # carried over as-is (the JSONL readers skip them).
+    with output_file.open("wb") as outfile:
         for jsonl_file in input_folder.glob("*.jsonl"):
-            with jsonl_file.open("r", encoding="utf-8") as infile:
-                for line in infile:
-                    if line.strip():  # Skip empty lines
-                        outfile.write(line)
+            with jsonl_file.open("rb") as infile:
+                shutil.copyfileobj(infile, outfile, 1 << 20)
+                # keep the next file's first record on its own line
+                if infile.tell():
+                    infile.seek(-1, 2)
+                    if infile.read(1) != b"\n":
+                        outfile.write(b"\n")
 
 
 
 if __name__ == "__main__":
     merge_jsonl_files(input_folder, output_file)
-    print(f"Merged JSONL files into {output_file.resolve()}")
\ No newline at end of file
+    print(f"Merged JSONL files into {output_file.resolve()}")
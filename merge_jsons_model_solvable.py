@@ -15,34 +15,43 @@ Assumptions
 
 * Every first-level sub-folder contains at least one `.json`.
 * Each JSON file contains a valid JSON value (object, list, number, …).
-* All those values are collected into a single Python list and written out.
+* All those values are streamed out as one JSON array, one element per line.
 """
 
-import json
+import os
 from pathlib import Path
 
+import orjson
+
 # -------------- edit these two paths only -------------- #
 PARENT_DIR = Path(r"files/model_solvable_1")
 OUTPUT_FILE = Path(r"files/delivery/batch_4/raw_1.json")
 # ----------------------------------------------------- #
 
 def main() -> None:
-    merged: list = []
-
-    for child in PARENT_DIR.iterdir():
-        if not child.is_dir():
-            continue  # skip files in the parent folder itself
-
-        # grab every *.json directly inside this sub-folder
-        for json_path in child.glob("*.json"):
-            with json_path.open("r", encoding="utf-8") as f:
-                merged.append(json.load(f))
-
-    # dump the combined list
-    OUTPUT_FILE.write_text(
-        json.dumps(merged, indent=2, ensure_ascii=False), encoding="utf-8"
-    )
-    print(f"👍  Merged {len(merged)} JSON file(s) into {OUTPUT_FILE}")
+    count = 0
+
+    # elements are written as soon as they are parsed; the merged list is never built
+    with OUTPUT_FILE.open("wb") as out, os.scandir(PARENT_DIR) as children:
+        out.write(b"[\n")
+        for child in children:
+            if not child.is_dir():
+                continue  # skip files in the parent folder itself
+
+            # grab every *.json directly inside this sub-folder
+            with os.scandir(child.path) as entries:
+                for entry in entries:
+                    if not (entry.name.endswith(".json") and entry.is_file()):
+                        continue
+                    with open(entry.path, "rb") as f:
+                        value = orjson.loads(f.read())
+                    if count:
+                        out.write(b",\n")
+                    out.write(orjson.dumps(value))
+                    count += 1
+        out.write(b"\n]\n")
+
+    print(f"👍  Merged {count} JSON file(s) into {OUTPUT_FILE}")
 
 if __name__ == "__main__":
     main()
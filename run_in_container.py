@@ -1,18 +1,26 @@
 #!/usr/bin/env python3
-import json, os, shutil, subprocess, sys, xml.etree.ElementTree as ET, logging
+import fcntl, functools, json, multiprocessing, os, shutil, subprocess, sys, logging
 from pathlib import Path
 from typing import Iterable, Set
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import traceback
 from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import etree
 
 # ── environment -----------------------------------------------------------
 PR_SET = {int(x) for x in os.environ["PR_LIST"].split(",")}
 PART_FILE = Path(os.environ["PART_FILE"])
+PR_PROCS = max(1, int(os.environ.get("PR_PROCS", "1")))  # PRs built at once; each runs two Maven builds
 LOG_FILE = PART_FILE.with_suffix(".log")  # worker log
 ROOT = Path("/workspace")
 INPUT_PATH = ROOT / "inputs.json"
 REPOS_ROOT = Path("/tmp/repos")
+WORKTREE_SLOTS = ("overlay", "head")
+SHARED_M2 = Path("/home/circleci/.m2/repository")  # host cache mounted by extract_tests_host
+MAX_ARG = min(os.sysconf("SC_ARG_MAX") - 4096, 1 << 17)  # argv byte budget per git call
 
 # ── logging: console + file ----------------------------------------------
 LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -58,52 +66,135 @@ def sh(cmd: Iterable[str] | str, cwd: Path | None = None) -> subprocess.Complete
         cmd, cwd=cwd,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        text=True, bufsize=1
+        bufsize=1 << 16
     )
 
-    # this deque will only ever hold the last 100 lines
-    tail = deque(maxlen=1000)
-
+    # raw bytes are kept; only the tail that is returned is decoded in one go
+    tail = deque(maxlen=1000)  # last 1000 lines
     for line in proc.stdout:
-        tail.append(line)  # drop oldest if >100
-        log.debug("%s", line.rstrip())
+        tail.append(line)
+        log.debug("%s", line.decode("utf-8", "replace").rstrip())
 
     proc.wait()
     ret = proc.returncode
     if ret:
         log.error("command failed with exit code %d: %s", ret, " ".join(cmd))
 
-    # join only those last 100 lines
-    last_100 = "".join(tail)
-    return subprocess.CompletedProcess(cmd, ret, stdout=last_100)
+    return subprocess.CompletedProcess(cmd, ret, stdout=b"".join(tail).decode("utf-8", "replace"))
+
+
+def sh_silent(cmd: list[str], cwd: Path | None = None) -> subprocess.CompletedProcess:
+    # for git plumbing whose stdout nobody reads; stderr is kept for failures
+    proc = subprocess.run(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.decode("utf-8", "replace")
+    if proc.returncode:
+        log.error("command failed with exit code %d: %s\n%s", proc.returncode, " ".join(cmd), stderr.rstrip())
+    return subprocess.CompletedProcess(cmd, proc.returncode, stderr=stderr)
+
 
+@contextmanager
+def repo_lock(slug: str):
+    # clone/fetch/worktree-add of one repo must not interleave across PR processes
+    REPOS_ROOT.mkdir(parents=True, exist_ok=True)
+    with (REPOS_ROOT / f"{slug.replace('/', '_')}.lock").open("w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
 
+
+@functools.lru_cache(maxsize=None)
 def ensure_repo(slug: str) -> Path:
     local = REPOS_ROOT / slug.replace("/", "_")
     if not local.exists():
         local.parent.mkdir(parents=True, exist_ok=True)
         log.info(f"cloning {slug}")
-        sh(["git", "clone", "--quiet", f"https://github.com/{slug}.git", str(local)]).check_returncode()
-    sh(["git", "config", "--add", "remote.origin.fetch",
-        "+refs/pull/*/head:refs/remotes/origin/pr/*"], cwd=local).check_returncode()
-    sh(["git", "fetch", "--quiet", "--all", "--tags"], cwd=local).check_returncode()
+        sh_silent(["git", "clone", "--quiet", f"https://github.com/{slug}.git", str(local)]).check_returncode()
+    # --add appends unconditionally; a repeated refspec makes every later fetch slower
+    refspec = "+refs/pull/*/head:refs/remotes/origin/pr/*"
+    current = subprocess.run(["git", "config", "--get-all", "remote.origin.fetch"],
+                             cwd=local, stdout=subprocess.PIPE, text=True).stdout.splitlines()
+    if refspec not in current:
+        sh_silent(["git", "config", "--add", "remote.origin.fetch", refspec], cwd=local).check_returncode()
     return local
 
 
+def has_commit(repo: Path, sha: str) -> bool:
+    return subprocess.run(["git", "cat-file", "-e", f"{sha}^{{commit}}"], cwd=repo,
+                          stderr=subprocess.DEVNULL).returncode == 0
+
+
+def ensure_commits(repo: Path, pr: dict):
+    # fetch just what this PR needs instead of every ref of the upstream
+    shas = [sha for sha in (pr["base_commit"], pr["head_commit"]) if not has_commit(repo, sha)]
+    if not shas:
+        return
+    sh_silent(["git", "fetch", "--quiet", "origin", *shas], cwd=repo)
+    if not all(has_commit(repo, sha) for sha in shas):
+        n = pr["pr_number"]
+        sh_silent(["git", "fetch", "--quiet", "origin",
+                   f"pull/{n}/head:refs/remotes/origin/pr/{n}"], cwd=repo).check_returncode()
+
+
+def ensure_worktrees(repo: Path) -> dict[str, Path]:
+    # One detached worktree per run kind, so overlay and head can build at the
+    # same time. They are owned by this process and reused for its later PRs
+    # of the repo (only changed files are rewritten, the Maven repo stays
+    # warm); other processes get their own, so PRs never share a checkout.
+    trees = {}
+    for slot in WORKTREE_SLOTS:
+        wt = repo.with_name(f"{repo.name}.{slot}.{os.getpid()}")
+        if not wt.exists():
+            sh_silent(["git", "worktree", "add", "--detach", str(wt)], cwd=repo).check_returncode()
+        trees[slot] = wt
+    return trees
+
+
+def pin_maven_repo(wt: Path):
+    # Concurrent builds must not share a local repository (SNAPSHOT installs
+    # would overwrite each other). .mvn/maven.config is read by every Maven
+    # since 3.3.1, wrappers included, and no env var in test_command can undo
+    # it. The repo itself lives outside the worktree so `git clean` leaves it
+    # alone between PRs. The host-mounted cache is chained in as a read-only
+    # tail (Maven 3.9+) so a fresh repo does not start cold; new downloads
+    # land in the per-worktree repo only and never fill the shared cache.
+    cfg = wt / ".mvn" / "maven.config"
+    ours = (f"-Dmaven.repo.local={wt}.m2", f"-Dmaven.repo.local.tail={SHARED_M2}")
+    # keep a tracked config's own arguments; drop ours from an earlier run
+    lines = [ln for ln in (cfg.read_text().splitlines() if cfg.exists() else [])
+             if not ln.strip().startswith(("-Dmaven.repo.local=", "-Dmaven.repo.local.tail="))]
+    cfg.parent.mkdir(exist_ok=True)
+    cfg.write_text("\n".join([*lines, *ours]) + "\n")
+
+
+def _argv_chunks(paths: list[str]):
+    # as many paths per call as fit in MAX_ARG bytes, instead of a fixed count
+    chunk, size = [], 0
+    for p in paths:
+        n = len(p.encode()) + 1
+        if chunk and size + n > MAX_ARG:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(p)
+        size += n
+    if chunk:
+        yield chunk
+
+
 def overlay(repo: Path, head: str, tests: list[str]):
-    sh(["git", "checkout", "--quiet", "--detach"], cwd=repo)
-    for chunk in (tests[i:i + 50] for i in range(0, len(tests), 50)):
-        sh(["git", "restore", "--source", head, "--worktree", "--staged", "--", *chunk],
-           cwd=repo).check_returncode()
+    sh_silent(["git", "checkout", "--quiet", "--detach"], cwd=repo)
+    for chunk in _argv_chunks(tests):
+        sh_silent(["git", "restore", "--source", head, "--worktree", "--staged", "--", *chunk],
+                  cwd=repo).check_returncode()
 
 
 def clean(repo: Path, patterns):
     for pat in patterns:
-        for fp in repo.glob(pat):
+        for fp in list(repo.glob(pat)):
             try:
                 fp.unlink()
             except IsADirectoryError:
                 shutil.rmtree(fp, ignore_errors=True)
+            except FileNotFoundError:
+                pass  # inside a directory removed earlier in this pass
 
 
 def parse(repo: Path, patterns):
@@ -112,32 +203,35 @@ def parse(repo: Path, patterns):
         for fp in repo.glob(pat):
             if fp.suffix.lower() != ".xml":
                 continue
+            # stream <testcase> elements instead of building the whole tree
             try:
-                tree = ET.parse(fp)
-            except ET.ParseError:
+                for _, tc in etree.iterparse(str(fp), events=("end",), tag="testcase", recover=True):
+                    ident = f"{tc.get('classname', '?')}#{tc.get('name', '?')}"
+                    all_t.add(ident)
+                    if tc.find("failure") is not None or tc.find("error") is not None:
+                        fail.add(ident)
+                    tc.clear()
+            except etree.XMLSyntaxError:
                 continue
-            for tc in tree.iterfind(".//testcase"):
-                ident = f"{tc.get('classname', '?')}#{tc.get('name', '?')}"
-                all_t.add(ident)
-                if tc.find("failure") is not None or tc.find("error") is not None:
-                    fail.add(ident)
     return all_t, fail
 
 
 def run(repo: Path, sha: str, cmd: str, patterns):
-    sh(["git", "clean", "-ffd"], cwd=repo)
-    sh(["git", "reset", "--hard", "--quiet", sha], cwd=repo)
+    sh_silent(["git", "clean", "-ffd"], cwd=repo)
+    sh_silent(["git", "reset", "--hard", "--quiet", sha], cwd=repo)
     clean(repo, patterns)
+    pin_maven_repo(repo)
     proc = sh(cmd, cwd=repo)
     _, fail = parse(repo, patterns)
     return proc.returncode, proc.stdout, fail
 
 
 def run_overlay(repo: Path, base: str, head: str, cmd: str, patterns, tests):
-    sh(["git", "reset", "--hard", "--quiet"], cwd=repo)
-    sh(["git", "checkout", "--quiet", base], cwd=repo)
+    sh_silent(["git", "reset", "--hard", "--quiet"], cwd=repo)
+    sh_silent(["git", "checkout", "--quiet", base], cwd=repo)
     overlay(repo, head, tests)
     clean(repo, patterns)
+    pin_maven_repo(repo)
     proc = sh(cmd, cwd=repo)
     all_t, fail = parse(repo, patterns)
     return proc.returncode, proc.stdout, all_t, fail
@@ -157,93 +251,121 @@ def load_inputs():
 
 # ── main loop -------------------------------------------------------------
 def create_cmd(cmd, tests):
-    integration_tests = [t for t in tests if t.endswith(".java") and "IT" in t.split("/")[-1]]
-    unit_tests = [t for t in tests if t.endswith("Test.java")]
-    ignored_tests = [t for t in tests if t not in integration_tests + unit_tests]
-
-    if integration_tests:
-        integration_tests = [t.split("/")[-1].replace(".java", "") for t in integration_tests]
-        integration_tests = ','.join(integration_tests)
-    else:
-        integration_tests = "NO_INTEGRATION_TESTS"
-
-    if unit_tests:
-        unit_tests = [t.split("/")[-1].replace(".java", "") for t in unit_tests]
-        unit_tests = ','.join(unit_tests)
-    else:
-        unit_tests = "NO_UNIT_TESTS"
+    # single pass; a name can be both an IT and a unit test (e.g. FooITTest.java)
+    integration_tests, unit_tests, ignored_tests = [], [], []
+    for t in tests:
+        base = t.rpartition("/")[2]
+        is_it = base.endswith(".java") and "IT" in base
+        is_unit = base.endswith("Test.java")
+        if is_it:
+            integration_tests.append(base.replace(".java", ""))
+        if is_unit:
+            unit_tests.append(base.replace(".java", ""))
+        if not (is_it or is_unit):
+            ignored_tests.append(t)
+
+    integration_tests = ",".join(integration_tests) or "NO_INTEGRATION_TESTS"
+    unit_tests = ",".join(unit_tests) or "NO_UNIT_TESTS"
 
     cmd = cmd.replace("<unit_tests>", unit_tests).replace("<integration_tests>", integration_tests)
 
     return cmd, ignored_tests
 
 
+def process_pr(pr: dict) -> dict:
+    result = dict(pr)
+    try:
+        with repo_lock(pr["repo"]):
+            repo = ensure_repo(pr["repo"])
+            ensure_commits(repo, pr)
+            trees = ensure_worktrees(repo)
+        # the worktrees are reused across PRs: drop the last PR's untracked files first
+        for wt in trees.values():
+            sh_silent(["git", "clean", "-ffd"], cwd=wt)
+        pat = pr.get("test_files", ["**/surefire-reports/*.xml"])
+        tests = pr["modified_test"]
+        cmd, ignored_tests = create_cmd(pr["test_command"], tests)
+
+        # overlay and head run side by side; the head result is only
+        # used when the overlay run succeeded
+        with ThreadPoolExecutor(max_workers=len(WORKTREE_SLOTS)) as pool:
+            o_fut = pool.submit(run_overlay, trees["overlay"], pr["base_commit"],
+                                pr["head_commit"], cmd, pat, tests)
+            h_fut = pool.submit(run, trees["head"], pr["head_commit"], cmd, pat)
+            o_code, o_log, o_all, o_fail = o_fut.result()
+            h_code, h_log, h_fail = h_fut.result()
+
+        errors = {}
+        result = pr | {"test_command": cmd}
+
+        if ignored_tests:
+            result["ignored_tests"] = ignored_tests
+
+        if o_code:
+            result["errors"] = {"overlay_run": o_log[-4000:]}
+            log.error(f"PR #{pr['pr_number']} overlay failed")
+        else:
+            if h_code:
+                errors["head_tests"] = h_log[-4000:]
+
+            if errors:
+                result["errors"] = errors
+                log.error(f"PR #{pr['pr_number']} errors: {', '.join(errors)}")
+            else:
+                pre = h_fail
+                ignore2pass = o_fail & pre
+                fail2pass = o_fail - pre
+                pass2pass = o_all - o_fail
+                result = result | {
+                    "fail2pass": sorted(fail2pass),
+                    "ignore2pass": sorted(ignore2pass),
+                    "pass2pass": sorted(pass2pass),
+                }
+                log.info(f"PR #{pr['pr_number']} f2p={len(fail2pass)} "
+                         f"ig2p={len(ignore2pass)} pass={len(pass2pass)}")
+
+    except Exception as exc:
+        log.error(f"PR #{pr['pr_number']} crashed: {exc}")
+        result["errors"] = {
+            "runner": {
+                "type": type(exc).__name__,
+                "message": str(exc),
+                "traceback": traceback.format_exc().splitlines()
+            }
+        }
+
+    return result
+
+
+def _init_pr_process(queue):
+    # the rotating file handler is not multi-process safe: route records to the parent
+    logging.getLogger().handlers[:] = [QueueHandler(queue)]
+
+
 def main():
     prs = [pr for pr in load_inputs() if pr["pr_number"] in PR_SET]
     PART_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with PART_FILE.open("w", encoding="utf-8") as sink:
-        os.chmod(PART_FILE, 0o666)  # host can delete or overwrite later
-        for pr in prs:
-            try:
-                repo = ensure_repo(pr["repo"])
-                pat = pr.get("test_files", ["**/surefire-reports/*.xml"])
-                tests = pr["modified_test"]
-                cmd, ignored_tests = create_cmd(pr["test_command"], tests)
-
-                o_code, o_log, o_all, o_fail = run_overlay(
-                    repo, pr["base_commit"], pr["head_commit"],
-                    cmd, pat, tests
-                )
-
-                errors = {}
-                result = pr | {"test_command": cmd}
-
-                if ignored_tests:
-                    result["ignored_tests"] = ignored_tests
-
-                if o_code:
-                    result["errors"] = {"overlay_run": o_log[-4000:]}
-                    log.error(f"PR #{pr['pr_number']} overlay failed")
-                else:
-                    h_code, h_log, h_fail = run(repo, pr["head_commit"], cmd, pat)
-
-                    if h_code:
-                        errors["head_tests"] = h_log[-4000:]
-
-                    if errors:
-                        result["errors"] = errors
-                        log.error(f"PR #{pr['pr_number']} errors: {', '.join(errors)}")
-                    else:
-                        pre = h_fail
-                        ignore2pass = o_fail & pre
-                        fail2pass = o_fail - pre
-                        pass2pass = o_all - o_fail
-                        result = result | {
-                            "fail2pass": sorted(fail2pass),
-                            "ignore2pass": sorted(ignore2pass),
-                            "pass2pass": sorted(pass2pass),
-                        }
-                        log.info(f"PR #{pr['pr_number']} f2p={len(fail2pass)} "
-                                 f"ig2p={len(ignore2pass)} pass={len(pass2pass)}")
-
-            except Exception as exc:
-                log.error(f"PR #{pr['pr_number']} crashed: {exc}")
-                result["errors"] = {
-                    "runner": {
-                        "type": type(exc).__name__,
-                        "message": str(exc),
-                        "traceback": traceback.format_exc().splitlines()
-                    }
-                }
-
-            sink.write(json.dumps(result, ensure_ascii=False) + "\n")
-            sink.flush()
 
-            # ------------- new: tell the host that this PR is done ----------------
-            status = "SUCCESS" if "errors" not in result else "FAILURE"
-            # One plain line; the host watches for the literal prefix "RESULT"
-            print(f"RESULT {pr['pr_number']} {status}", flush=True)
-            # ----------------------------------------------------------------------
+    queue = multiprocessing.Queue()
+    listener = QueueListener(queue, handler)
+    listener.start()
+    try:
+        with PART_FILE.open("w", encoding="utf-8") as sink, \
+                multiprocessing.Pool(max(1, min(len(prs), PR_PROCS)),
+                                     initializer=_init_pr_process, initargs=(queue,)) as procs:
+            os.chmod(PART_FILE, 0o666)  # host can delete or overwrite later
+            # results arrive in completion order; each line is self-contained
+            for result in procs.imap_unordered(process_pr, prs):
+                sink.write(json.dumps(result, ensure_ascii=False) + "\n")
+                sink.flush()
+
+                # ------------- new: tell the host that this PR is done ----------------
+                status = "SUCCESS" if "errors" not in result else "FAILURE"
+                # One plain line; the host watches for the literal prefix "RESULT"
+                print(f"RESULT {result['pr_number']} {status}", flush=True)
+                # ----------------------------------------------------------------------
+    finally:
+        listener.stop()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,9 @@
-import json
+from itertools import chain
 from pathlib import Path
 
+import ijson
+import orjson
+
 from numpy.ma.core import count
 
 DELIVERIES = [f"batch_{i}" for i in [1, 3]]
@@ -8,51 +11,50 @@ DELIVERY_FOLDER = Path("files/delivery")
 INPUT_FOLDER = Path("files/fixed_inputs")
 OUTPUT_FOLDER = Path("files/selected_inputs")
 
-selected_repos = {}
+# Only the task ids are kept per repo; the delivered records themselves
+# (Dockerfile, patches, …) are dropped as soon as each line is read.
+selected_repos: dict[str, list[str]] = {}
 for delivery in DELIVERIES:
     delivery_final = DELIVERY_FOLDER / delivery / f"{delivery}-final.jsonl"
-    with open(delivery_final, "r") as f:
+    with open(delivery_final, "rb") as f:
         for line in f:
             if line.strip():
-                obj = json.loads(line)
-                repo = obj["repo"]
-                if repo not in selected_repos:
-                    selected_repos[repo] = []
+                obj = orjson.loads(line)
+                selected_repos.setdefault(obj["repo"], []).append(obj["task_id"])
 
-                selected_repos[repo].append(obj)
 
+# (repo, pr number as str) of every delivered task
+keep = {(repo, task_id.rsplit("#", 1)[1])
+        for repo, task_ids in selected_repos.items() for task_id in task_ids}
 
 count = 0
-matched_prs = []
+matched_prs = set()
 for file in INPUT_FOLDER.glob("*.json"):
-    with file.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    repo = data[0]["repo"]
-    if repo not in selected_repos:
-        continue
-
-    selected_pr_numbers = {item["task_id"].split("#")[-1] for item in selected_repos[repo]}
-    selected_prs = [d for d in data if f"{d["pr_number"]}" in selected_pr_numbers]
-
-    with (OUTPUT_FOLDER / file.name).open("w", encoding="utf-8") as f:
-        json.dump(selected_prs, f, indent=4)
+    # stream the input array; a file is one repo, so its first item decides
+    selected_prs = []
+    with file.open("rb") as f:
+        items = ijson.items(f, "item", use_float=True)
+        first = next(items, None)
+        if first is None or first["repo"] not in selected_repos:
+            continue
+        for d in chain((first,), items):
+            if (d["repo"], str(d["pr_number"])) in keep:
+                selected_prs.append(d)
+
+    (OUTPUT_FOLDER / file.name).write_bytes(orjson.dumps(selected_prs, option=orjson.OPT_INDENT_2))
 
     print(f"✓ wrote {len(selected_prs)} objects → {OUTPUT_FOLDER / file.name}")
 
     count += len(selected_prs)
-    matched_prs += [f"{d["repo"]}#{d["pr_number"]}" for d in selected_prs]
+    matched_prs.update(f"{d["repo"]}#{d["pr_number"]}" for d in selected_prs)
 
 total_tasks = sum(len(v) for v in selected_repos.values())
 print(f"✓ wrote a total of {count} objects out of {total_tasks} selected tasks")
 print("selected repos:", ", ".join(selected_repos.keys()))
 
 # print out the ids that didnt matched
-unmatched_prs = []
-for repo, items in selected_repos.items():
-    for item in items:
-        if item["task_id"] not in matched_prs:
-            unmatched_prs.append(item["task_id"])
+unmatched_prs = [task_id for task_ids in selected_repos.values()
+                 for task_id in task_ids if task_id not in matched_prs]
 
 
 if unmatched_prs:
@@ -1,10 +1,17 @@
 import json
+import re
 from pathlib import Path
 
+import orjson
+
 INPUT_PATH = Path("files/cdap_inputs.json")
 RUN_PATH = Path("files/run-cdap")
 OUTPUT_PATH = Path("files/cdap_inputs_filtered.json")
 
+ERROR_MSG = "Could not resolve dependencies for project io.cdap.cdap:cdap-standalone:jar:6.11.0-SNAPSHOT"
+NEEDLE = ERROR_MSG.encode()  # has nothing JSON would escape, so it matches the raw line
+PR_NUMBER_RE = re.compile(rb'"pr_number"\s*:\s*(\d+)')
+
 
 
 # I want a code that reads all the jsonl files in the RUN_PATH directory, and filter the input data based on those that throw an error. and the error contains this meesage "Could not resolve dependencies for project io.cdap.cdap:cdap-standalone:jar:6.11.0-SNAPSHOT" the input data has a pr files that has a pr numebr that the prs should be filterd based on that
@@ -13,18 +20,23 @@ def main():
     if not RUN_PATH.exists():
         raise FileNotFoundError(f"Cannot find {RUN_PATH}")
 
-    filtered_prs = []
-
-    with OUTPUT_PATH.open("w", encoding="utf-8") as outfile:
-        for file in RUN_PATH.glob("*.jsonl"):
-            with file.open("r", encoding="utf-8") as infile:
-                for line in infile:
-                    if not line.strip():
+    filtered_prs = set()
+
+    for file in RUN_PATH.glob("*.jsonl"):
+        with file.open("rb") as infile:
+            for line in infile:
+                if not line.strip():
+                    continue
+                # without the message anywhere in the line, only pr_number is needed
+                if NEEDLE not in line:
+                    m = PR_NUMBER_RE.search(line)
+                    if m:
+                        filtered_prs.add(int(m.group(1)))
                         continue
-                    rec = json.loads(line)
-                    errors = rec.get("errors", {})
-                    if not any("Could not resolve dependencies for project io.cdap.cdap:cdap-standalone:jar:6.11.0-SNAPSHOT" in str(err) for err in errors.values()):
-                        filtered_prs.append(rec["pr_number"])
+                rec = orjson.loads(line)
+                errors = rec.get("errors", {})
+                if not any(ERROR_MSG in str(err) for err in errors.values()):
+                    filtered_prs.add(rec["pr_number"])
 
 
     with INPUT_PATH.open("r", encoding="utf-8") as infile, OUTPUT_PATH.open("w", encoding="utf-8") as outfile:
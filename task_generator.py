@@ -9,9 +9,11 @@ filter each record, and write the consolidated results to
 
 import csv
 import json
-from itertools import count
+from itertools import islice
 from pathlib import Path
 
+import orjson
+
 # ── configuration ─────────────────────────────────────────────────────────────
 INPUT_DIR    = Path("files/run-debezium-new")   # folder to scan
 PATTERN      = "final*.jsonl"                      # filename pattern
@@ -26,9 +28,11 @@ def is_empty(value) -> bool:
 
 
 def qualify(rec: dict) -> bool:
-    no_errors = "errors" not in rec or is_empty(rec["errors"])
-    has_f2p   = isinstance(rec.get("fail2pass"), list) and rec["fail2pass"]
-    return no_errors and has_f2p
+    # one lookup per field; a missing "errors" reads as None, which is empty
+    if not is_empty(rec.get("errors")):
+        return False
+    f2p = rec.get("fail2pass")
+    return isinstance(f2p, list) and len(f2p) > 0
 
 
 def build_metadata(rec: dict) -> dict:
@@ -39,6 +43,18 @@ def build_metadata(rec: dict) -> dict:
     return {"Repository": repo, "PR Number": pr, "PR Link": link}
 
 
+def qualifying_meta(input_files):
+    """Metadata of every qualifying record, file by file; read only as far as it is consumed."""
+    for infile in input_files:
+        with infile.open("rb") as fin:
+            for line in fin:
+                if not line.strip():
+                    continue
+                rec = orjson.loads(line)
+                if qualify(rec):
+                    yield build_metadata(rec)
+
+
 def main() -> None:
     # Find source files
     input_files = sorted(INPUT_DIR.glob(PATTERN))
@@ -56,26 +72,10 @@ def main() -> None:
         csv_writer = csv.DictWriter(csvfile, fieldnames=["metadata"])
         csv_writer.writeheader()
 
-        # Walk through every matching input file
-        for infile in input_files:
-            if count > MAX_NUMBER:
-                break
-
-            with infile.open("r", encoding="utf-8") as fin:
-                for line in fin:
-                    if not line.strip():
-                        continue
-                    rec = json.loads(line)
-                    if not qualify(rec):
-                        continue
-
-                    meta = build_metadata(rec)
-                    
-                    csv_writer.writerow({"metadata": json.dumps(meta, ensure_ascii=False)})
-                    count += 1
-
-                    if count > MAX_NUMBER:
-                        break
+        # Walk the matching input files, stopping as soon as the limit is hit
+        for meta in islice(qualifying_meta(input_files), MAX_NUMBER + 1):
+            csv_writer.writerow({"metadata": json.dumps(meta, ensure_ascii=False)})
+            count += 1
 
     print(f"Collected {count} records from {len(input_files)} files.")
 
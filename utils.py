@@ -1,4 +1,6 @@
+_TEST_SUFFIXES = ("test.java", "it.java")
+
 
 def is_test(path: str) -> bool:
     p = path.lower()
-    return "test/" in p or "tests/" in p or p.endswith("test.java") or p.endswith("it.java")
\ No newline at end of file
+    return p.endswith(_TEST_SUFFIXES) or "test/" in p or "tests/" in p